@@ -0,0 +1,73 @@
+import streamlit as st
+
+import aggregates
+import screening
+import survey_schema
+import trends
+
+# -------------------------------
+# Live trial dashboard
+# -------------------------------
+# Reads only the pre-computed counters in aggregates.db, so each view costs
+# one lookup per chart regardless of how many responses have been saved.
+# Picking a single client of a form with ordered scales also shows that
+# client's visit-by-visit trajectory from the trend index (trends.py).
+# Free-text answers flagged by the screener (screening.py) are listed at
+# the bottom, with a term/phrase search over all of them.
+
+FORMS = {"On-Trial": "on_trial", "Post-Trial": "post_trial"}
+ALL_LABEL = "All"
+
+st.title("Trial Feedback Dashboard")
+
+tallies = aggregates.get_aggregates()
+form = survey_schema.compile_form(FORMS[st.selectbox("Form", list(FORMS))])
+english = form.locale("English")
+
+
+def pick(label, dimension):
+    value = st.sidebar.selectbox(label, [ALL_LABEL] + tallies.values(form.name, dimension))
+    return aggregates.ALL if value == ALL_LABEL else value
+
+
+client = pick("Client", "client")
+language = pick("Language", "language")
+period = pick("Week", "period")
+
+st.caption(f"{tallies.submissions(form.name, client, language, period)} responses")
+
+if form.ordinal_fields and client != aggregates.ALL:
+    index = trends.get_trends(form.name).index()
+    history = index.history(client)
+    st.subheader(f"Trajectory of {client} (0 = best)")
+    for key, flag in index.flags(client):
+        st.warning(f"{english[form.by_key[key].label]}: {flag}")
+    st.line_chart(
+        history.set_index("timestamp")[[field.key for field in form.ordinal_fields]]
+        .rename(columns={field.key: field.column for field in form.ordinal_fields})
+    )
+
+for field in form.fields:
+    if not field.codes:
+        continue
+    counts = tallies.distribution(form.name, field.key, client, language, period)
+    labels = english.options[field.key]
+    st.subheader(english[field.label])
+    st.bar_chart(
+        {"Responses": {labels[i]: counts.get(code, 0) for i, code in enumerate(field.codes)}},
+        horizontal=True,
+    )
+
+texts = screening.get_screener().index
+st.subheader("Flagged free-text answers")
+flagged = texts.flagged(form.name, None if client == aggregates.ALL else client)
+st.dataframe(
+    [dict(zip(("Form", "Client", "Submitted", "Question", "Answer", "Category", "Matched"), row)) for row in flagged],
+    hide_index=True,
+)
+query = st.text_input("Search free-text answers")
+if query:
+    st.dataframe(
+        [dict(zip(("Form", "Client", "Submitted", "Question", "Answer"), row)) for row in texts.search(query)],
+        hide_index=True,
+    )
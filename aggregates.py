@@ -0,0 +1,203 @@
+import itertools
+import logging
+import sys
+import threading
+from datetime import datetime
+
+import streamlit as st
+
+import localdb
+import metrics
+
+# -------------------------------
+# Live answer distributions
+# -------------------------------
+# Every saved row adds one to a counter per choice answer, keyed by
+# (form, question, client, language, ISO week, option code). Each answer is
+# also counted under "*" for every combination of client, language and
+# period, so any dashboard filter is a single primary-key lookup no matter
+# how many responses exist. rebuild() recomputes everything for a form
+# from a DataFrame of sheet rows, e.g. for backfill from the local mirror
+# with `python aggregates.py rebuild`.
+
+AGGREGATES_FILE = "aggregates.db"
+ALL = "*"
+# Period of rows whose timestamp does not parse (blank or hand-edited cells)
+UNKNOWN_PERIOD = "unknown"
+
+# Pseudo-question counting submissions, for "n =" next to a chart
+SUBMISSIONS = "_submissions"
+
+logger = logging.getLogger(__name__)
+
+
+def period_of(timestamp):
+    # "2026-10-18 09:30:00" -> "2026-W42"; UNKNOWN_PERIOD if it does not parse
+    try:
+        year, week, _ = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").isocalendar()
+    except ValueError:
+        return UNKNOWN_PERIOD
+    return f"{year}-W{week:02d}"
+
+
+def answer_codes(form, values):
+    # (question, code) for every choice answer in a sheet row, as rebuild()
+    # reads them: by localized label, hidden questions being blank
+    row = dict(zip(form.headers, values))
+    language = row[form.column_of("language")]
+    for field in form.fields:
+        if not field.codes:
+            continue
+        answer = row[field.column]
+        for label in answer.split(", ") if field.widget == "multiselect" else [answer]:
+            code = form.code_of(field.key, label, language)
+            if code is not None:
+                yield field.key, code
+
+
+def _rollups(client, language, period):
+    return itertools.product((client, ALL), (language, ALL), (period, ALL))
+
+
+class Aggregates:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS aggregates ("
+                " form TEXT NOT NULL, question TEXT NOT NULL, client TEXT NOT NULL,"
+                " language TEXT NOT NULL, period TEXT NOT NULL, option TEXT NOT NULL,"
+                " count INTEGER NOT NULL,"
+                " PRIMARY KEY (form, question, client, language, period, option))"
+            )
+
+    def _increment(self, rows):
+        self.db.executemany(
+            "INSERT INTO aggregates VALUES (?, ?, ?, ?, ?, ?, 1)"
+            " ON CONFLICT (form, question, client, language, period, option)"
+            " DO UPDATE SET count = count + 1",
+            rows,
+        )
+
+    def record(self, form, values):
+        # values: a saved sheet row. A failed tally must not fail a
+        # submission that is already spooled; the next rebuild() repairs
+        # the counts.
+        row = dict(zip(form.headers, values))
+        answers = [(SUBMISSIONS, "")] + list(answer_codes(form, values))
+        rollups = _rollups(
+            row[form.column_of("client")], row[form.column_of("language")],
+            period_of(row[form.column_of("timestamp")]),
+        )
+        rows = [(form.name, question, c, l, p, code) for c, l, p in rollups for question, code in answers]
+        try:
+            with self._lock, self.db:
+                self._increment(rows)
+        except Exception:
+            logger.exception("Could not update aggregates for %s", form.name)
+            metrics.REGISTRY.increment("aggregate_failures", form=form.name)
+
+    def distribution(self, form_name, question, client=ALL, language=ALL, period=ALL):
+        with self._lock:
+            return dict(self.db.execute(
+                "SELECT option, count FROM aggregates WHERE form = ? AND question = ?"
+                " AND client = ? AND language = ? AND period = ?",
+                (form_name, question, client, language, period),
+            ))
+
+    def submissions(self, form_name, client=ALL, language=ALL, period=ALL):
+        return self.distribution(form_name, SUBMISSIONS, client, language, period).get("", 0)
+
+    def values(self, form_name, dimension):
+        # Known clients, languages or periods for a form, for filter pickers
+        if dimension not in ("client", "language", "period"):
+            raise ValueError(dimension)
+        with self._lock:
+            return [
+                value for (value,) in self.db.execute(
+                    f"SELECT DISTINCT {dimension} FROM aggregates"
+                    f" WHERE form = ? AND question = ? AND {dimension} != ? ORDER BY {dimension}",
+                    (form_name, SUBMISSIONS, ALL),
+                )
+            ]
+
+    def rebuild(self, form, frame):
+        # frame: one row per response, columns named like form.headers
+        counts = tally_frame(form, frame)
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM aggregates WHERE form = ?", (form.name,))
+            self.db.executemany(
+                "INSERT INTO aggregates VALUES (?, ?, ?, ?, ?, ?, ?)",
+                counts.itertuples(index=False, name=None),
+            )
+        return len(counts)
+
+
+def tally_frame(form, frame):
+    import pandas as pd
+
+    iso = pd.to_datetime(frame[form.column_of("timestamp")], errors="coerce").dt.isocalendar()
+    period = iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
+    base = pd.DataFrame({
+        "client": frame[form.column_of("client")].astype(str),
+        "language": frame[form.column_of("language")].astype(str),
+        "period": period.where(iso["year"].notna(), UNKNOWN_PERIOD),
+    })
+    parts = [base.assign(question=SUBMISSIONS, option="")]
+    for field in form.fields:
+        if not field.codes:
+            continue
+        answers = base.assign(question=field.key, label=frame[field.column].astype(str))
+        if field.widget == "multiselect":
+            answers = answers.assign(label=answers["label"].str.split(", ")).explode("label")
+        # Localized label -> canonical code, looked up per language
+        codes = pd.Series(
+            {(language, label): field.codes[i]
+             for language, index in form.label_index.items()
+             for label, i in index[field.key].items()},
+            dtype=object,
+        )
+        keys = pd.MultiIndex.from_arrays([answers["language"], answers["label"]])
+        answers = answers.assign(option=codes.reindex(keys).to_numpy()).dropna(subset=["option"])
+        parts.append(answers.drop(columns="label"))
+    answers = pd.concat(parts, ignore_index=True)
+
+    rolled = []
+    for client_all, language_all, period_all in itertools.product((False, True), repeat=3):
+        rolled.append(answers.assign(
+            client=ALL if client_all else answers["client"],
+            language=ALL if language_all else answers["language"],
+            period=ALL if period_all else answers["period"],
+        ))
+    counts = (
+        pd.concat(rolled, ignore_index=True)
+        .groupby(["question", "client", "language", "period", "option"], sort=False)
+        .size()
+        .reset_index(name="count")
+    )
+    counts.insert(0, "form", form.name)
+    # object dtype so sqlite3 receives Python ints, not numpy scalars
+    return counts[["form", "question", "client", "language", "period", "option", "count"]].astype(object)
+
+
+@st.cache_resource(show_spinner=False)
+def get_aggregates():
+    return Aggregates(localdb.connect(AGGREGATES_FILE))
+
+
+if __name__ == "__main__":
+    # python aggregates.py rebuild   recount every form from the local mirror
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python aggregates.py rebuild")
+    import mirror
+    import shards
+    import survey_schema
+
+    local = mirror.Mirror(localdb.connect(mirror.MIRROR_FILE))
+    directory = shards.open_directory()
+    tallies = Aggregates(localdb.connect(AGGREGATES_FILE))
+    for name in ("on_trial", "post_trial"):
+        form = survey_schema.compile_form(name)
+        frame = local.frame(directory.worksheets(form.worksheet), form.headers)
+        print(name, tallies.rebuild(form, frame), "counters")
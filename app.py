@@ -0,0 +1,32 @@
+import streamlit as st
+
+# -------------------------------
+# Single entry point for both surveys
+# -------------------------------
+# One Streamlit process serves both forms, so the Sheets client, worksheet
+# handles, spool, schema cache and background threads (all st.cache_resource
+# or lru_cache) exist once instead of once per app. Clients reach a form by
+# page URL (/on-trial, /post-trial) or by ?form=post_trial on the root URL;
+# the existing ?client= parameter works on both. The navigation menu is
+# hidden from participants. The staff dashboard is deliberately not a page
+# here: a hidden page is still reachable by anyone, so it runs as its own
+# app (`streamlit run Dashboard.py`) behind staff-only access.
+#
+#   streamlit run app.py
+
+PAGES = {
+    "on_trial": ("Feedback.py", "On-Trial Feedback", "on-trial"),
+    "post_trial": ("PostTrialFeedback.py", "Post-Trial Feedback", "post-trial"),
+}
+DEFAULT_FORM = "on_trial"
+
+form = st.query_params.get("form", DEFAULT_FORM)
+if form not in PAGES:
+    form = DEFAULT_FORM
+
+pages = [
+    st.Page(script, title=title, url_path=url_path, default=name == form)
+    for name, (script, title, url_path) in PAGES.items()
+]
+
+st.navigation(pages, position="hidden").run()
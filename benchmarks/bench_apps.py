@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# -------------------------------
+# Headless load test for both survey apps
+# -------------------------------
+# Drives Feedback.py and PostTrialFeedback.py through Streamlit's AppTest
+# from many concurrently open simulated sessions in all three languages,
+# with Google Sheets replaced by the in-process fake in fake_sheets.py.
+# AppTest swaps a process-global Runtime on every run, so sessions take
+# turns rerunning on one thread (round robin, `--concurrency` at a time)
+# while the spool flusher writes to the fake in the background.
+#
+#   python benchmarks/bench_apps.py --sessions 60 --concurrency 12 --latency 0.3
+#   python benchmarks/bench_apps.py --update-baseline
+#
+# Results are compared against benchmarks/baseline.json; the exit status is
+# 1 if any metric regressed by more than --tolerance.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("FEEDBACK_DATA_DIR", tempfile.mkdtemp(prefix="feedback-bench-"))
+os.environ.setdefault("FEEDBACK_SPOOL_FLUSH_INTERVAL", "0.2")
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import sheets  # noqa: E402
+import spool  # noqa: E402
+from benchmarks.fake_sheets import FakeSheets, FakeSheetsConnection  # noqa: E402
+
+APPS = {"on_trial": "Feedback.py", "post_trial": "PostTrialFeedback.py"}
+LANGUAGES = ["English", "Spanish", "German"]
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# Metrics where a larger number is better; everything else should shrink
+HIGHER_IS_BETTER = {"submits_per_second"}
+# Recorded with the baseline for reference only
+NOT_COMPARED = {"sessions"}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] if ordered else None
+
+
+def timed_run(at, timings):
+    start = time.perf_counter()
+    at.run()
+    timings.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def open_session(app, language, client, reruns):
+    at = AppTest.from_file(os.path.join(ROOT, APPS[app]), default_timeout=60)
+    at.query_params["client"] = client
+    timed_run(at, reruns)
+    at.selectbox[0].set_value(language)
+    timed_run(at, reruns)
+    return at
+
+
+def submit_session(app, language, client, reruns, submits):
+    # Generator: yields after each rerun so sessions can be interleaved
+    at = open_session(app, language, client, reruns)
+    yield
+    # Answer the first option everywhere so the "If yes" follow-ups appear
+    # (choice widgets hold option indices, see survey_form.py)
+    for radio in at.radio:
+        radio.set_value(0)
+    for multiselect in at.multiselect:
+        multiselect.set_value([0])
+    timed_run(at, reruns)
+    yield
+    for text in list(at.text_area) + list(at.text_input):
+        text.input(f"benchmark answer from {client}")
+    timed_run(at, reruns)
+    yield
+    at.button[0].click()
+    timed_run(at, submits)
+    if at.error or at.warning:
+        raise RuntimeError(f"{app}/{language}: submit was rejected")
+
+
+def drive(sessions, concurrency):
+    # Round robin over at most `concurrency` open sessions
+    pending = iter(sessions)
+    active = []
+    while True:
+        while len(active) < concurrency:
+            session = next(pending, None)
+            if session is None:
+                break
+            active.append(session)
+        if not active:
+            return
+        for session in list(active):
+            try:
+                next(session)
+            except StopIteration:
+                active.remove(session)
+
+
+def memory_per_session(app, count):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = [open_session(app, LANGUAGES[i % 3], f"mem-{i}", []) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    grown = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del sessions
+    return grown / count
+
+
+def wait_for_drain(timeout):
+    outbox = spool.get_spool()
+    deadline = time.monotonic() + timeout
+    while outbox.depth() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return outbox.depth()
+
+
+def run(args):
+    fake = FakeSheets(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    connection = FakeSheetsConnection(fake)
+    sheets.get_connection = lambda: connection
+
+    jobs = [
+        (app, LANGUAGES[i % len(LANGUAGES)], f"client-{i}")
+        for i in range(args.sessions)
+        for app in APPS
+    ]
+    reruns, submits = [], []
+    start = time.perf_counter()
+    drive((submit_session(*job, reruns, submits) for job in jobs), args.concurrency)
+    elapsed = time.perf_counter() - start
+    left = wait_for_drain(args.drain_timeout)
+
+    results = {
+        "sessions": len(jobs),
+        "rerun_p50_ms": percentile(reruns, 50) * 1000,
+        "rerun_p95_ms": percentile(reruns, 95) * 1000,
+        "submit_p50_ms": percentile(submits, 50) * 1000,
+        "submit_p95_ms": percentile(submits, 95) * 1000,
+        "submits_per_second": len(jobs) / elapsed,
+        "api_calls_per_submission": fake.total_calls() / len(jobs),
+        "memory_per_session_kb": statistics.mean(
+            memory_per_session(app, args.memory_sessions) for app in APPS
+        ) / 1024,
+        "undelivered_rows": left,
+        "api_calls": dict(fake.calls),
+        "writes": connection.writes.stats(),
+    }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if name in NOT_COMPARED:
+            continue
+        if not isinstance(expected, (int, float)) or not isinstance(actual, (int, float)) or not expected:
+            continue
+        change = (actual - expected) / expected
+        if name in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{name}: {actual:.3f} vs baseline {expected:.3f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test Feedback.py and PostTrialFeedback.py against a fake Sheets")
+    parser.add_argument("--sessions", type=int, default=30, help="simulated sessions per app")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Sheets latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--memory-sessions", type=int, default=10)
+    parser.add_argument("--drain-timeout", type=float, default=120)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        baseline = {k: round(v, 3) for k, v in results.items() if isinstance(v, (int, float))}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        return 0
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
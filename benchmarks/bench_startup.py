@@ -0,0 +1,126 @@
+import time
+
+START = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import resource  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+
+# -------------------------------
+# Startup time, memory and import cost
+# -------------------------------
+# Each measurement is a fresh Python process that imports the app, renders
+# the given pages once through AppTest (Sheets replaced by the fake) and
+# reports the time since the process started and its peak resident memory.
+# "separate" is the sum of one process per survey, as deployed before
+# app.py; "combined" is one app.py process rendering both pages. The time
+# to import each dependency in a fresh process (after Streamlit, which
+# every page needs) is reported alongside, together with which of them the
+# survey modules still import at module level.
+#
+#   python benchmarks/bench_startup.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEPARATE = [["Feedback.py"], ["PostTrialFeedback.py"]]
+COMBINED = ["app.py", "Feedback.py", "PostTrialFeedback.py"]
+DEPENDENCIES = (
+    "streamlit",
+    "requests",
+    "google.auth.transport.requests",
+    "google.oauth2.service_account",
+    "gspread",
+    "pandas",
+    "openpyxl",
+    "pyarrow",
+)
+# Everything the survey pages import at module level, including the sinks
+# behind sinks.get_fanout()
+PAGE_MODULES = "aggregates, metrics, preload, screening, sheets, sinks, spool, store, survey_form, survey_schema"
+
+
+def child(script, pages):
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("FEEDBACK_DATA_DIR", tempfile.mkdtemp(prefix="feedback-bench-"))
+    from streamlit.testing.v1 import AppTest
+
+    import sheets
+    from benchmarks.fake_sheets import FakeSheets, FakeSheetsConnection
+
+    connection = FakeSheetsConnection(FakeSheets(latency=0, jitter=0))
+    sheets.get_connection = lambda: connection
+
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=60)
+    at.run()
+    for page in pages:
+        at.switch_page(page)
+        at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return {
+        "startup_seconds": time.perf_counter() - START,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _python(code):
+    return subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT
+    ).stdout.strip().splitlines()[-1]
+
+
+def import_seconds(module, repeat):
+    # Best of `repeat` fresh processes; Streamlit is already loaded for the others
+    before = "" if module == "streamlit" else "import streamlit; "
+    code = f"import time; {before}start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    return min(float(_python(code)) for _ in range(repeat))
+
+
+def eager_imports():
+    # Heavy dependencies pulled in by importing the page modules
+    heavy = [name for name in DEPENDENCIES if name != "streamlit"]
+    code = f"import json, sys; import {PAGE_MODULES}; print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+    return json.loads(_python(code))
+
+
+def measure(command, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", *command],
+            capture_output=True, text=True, check=True, cwd=ROOT,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    # Best of `repeat`, to keep disk cache noise out
+    return {name: min(run[name] for run in runs) for name in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare startup of the separate apps with app.py")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child[0], args.child[1:])))
+        return
+
+    parts = [measure(command, args.repeat) for command in SEPARATE]
+    separate = {name: sum(part[name] for part in parts) for name in parts[0]}
+    combined = measure(COMBINED, args.repeat)
+    imports = {name: import_seconds(name, args.repeat) for name in DEPENDENCIES}
+    print(json.dumps({
+        "separate": separate,
+        "combined": combined,
+        "import_seconds": imports,
+        "imported_by_pages": eager_imports(),
+    }, indent=2))
+    for name in separate:
+        print(f"{name}: {combined[name]:.2f} vs {separate[name]:.2f} ({combined[name] / separate[name] - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# -------------------------------
+# Trend index rebuild and lookup timing
+# -------------------------------
+# Builds synthetic On-Trial sheet rows (random answers, random languages,
+# weekly visits), then times encode + compute for every client at once and
+# per-client history lookups.
+#
+#   python benchmarks/bench_trends.py --clients 5000 --visits 20
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import survey_schema  # noqa: E402
+import trends  # noqa: E402
+
+
+def synthetic_frame(form, clients, visits, seed=0):
+    import pandas as pd
+
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 5, 9)
+    rows = []
+    for c in range(clients):
+        for v in range(visits):
+            language = rng.choice(form.languages)
+            state = {
+                field.key: rng.randrange(len(field.codes)) if field.widget == "radio" else
+                [rng.randrange(len(field.codes))] if field.widget == "multiselect" else ""
+                for field in form.fields
+            }
+            when = start + timedelta(weeks=v, minutes=rng.randrange(600))
+            rows.append(form.row(state, language, f"client-{c:05d}", when.strftime("%Y-%m-%d %H:%M:%S")))
+    rng.shuffle(rows)
+    return pd.DataFrame(rows, columns=list(form.headers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the per-client trend index")
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--visits", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    form = survey_schema.compile_form("on_trial")
+    frame = synthetic_frame(form, args.clients, args.visits)
+
+    start = time.perf_counter()
+    index = trends.ClientIndex(form, trends.compute(form, trends.encode(form, frame)))
+    rebuild = time.perf_counter() - start
+
+    clients = index.clients()
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        index.history(clients[i % len(clients)])
+    lookup = (time.perf_counter() - start) / args.lookups
+
+    print(f"rows={len(frame)} clients={len(clients)}")
+    print(f"rebuild_seconds={rebuild:.3f}")
+    print(f"history_lookup_us={lookup * 1e6:.1f}")
+    print(f"flagged_clients={len(index.flagged())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+import requests
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+import sheets
+
+# -------------------------------
+# In-process stand-in for Google Sheets
+# -------------------------------
+# Implements the part of the gspread Worksheet/Spreadsheet API the apps
+# use, keeping rows in memory. Every call sleeps for `latency` seconds
+# (plus up to `jitter`) and fails with a real gspread APIError at
+# `error_rate`, so retries, backoff and the circuit breaker see the same
+# exceptions as in production.
+
+
+class FakeSheets:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=429, retry_after=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def call(self, name):
+        with self.lock:
+            self.calls[name] += 1
+            delay = self.latency + self.jitter * self.random.random()
+            fail = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise APIError(self.error_response())
+
+    def error_response(self):
+        response = requests.Response()
+        response.status_code = self.error_status
+        response._content = json.dumps(
+            {"error": {"code": self.error_status, "message": "Injected by FakeSheets", "status": "RESOURCE_EXHAUSTED"}}
+        ).encode()
+        if self.retry_after is not None:
+            response.headers["Retry-After"] = str(self.retry_after)
+        return response
+
+    def total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+
+class FakeWorksheet:
+    def __init__(self, fake, title, rows=None):
+        self.fake = fake
+        self.title = title
+        self.rows = rows if rows is not None else []
+
+    @property
+    def row_count(self):
+        return max(1000, len(self.rows))
+
+    def row_values(self, row):
+        self.fake.call("row_values")
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def col_values(self, col):
+        self.fake.call("col_values")
+        return [row[col - 1] if col <= len(row) else "" for row in self.rows]
+
+    def append_row(self, values, **kwargs):
+        self.fake.call("append_row")
+        self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self.fake.call("append_rows")
+        self.rows.extend(list(row) for row in values)
+
+    def _range(self, a1):
+        grid = a1_range_to_grid_range(a1)
+        start, end = grid.get("startRowIndex", 0), grid.get("endRowIndex", len(self.rows))
+        first, last = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+        return [row[first:last] for row in self.rows[start:end]]
+
+    def get_values(self, a1=None, **kwargs):
+        self.fake.call("get_values")
+        return self._range(a1) if a1 else [list(row) for row in self.rows]
+
+    def batch_get(self, ranges, **kwargs):
+        self.fake.call("batch_get")
+        return [self._range(a1) for a1 in ranges]
+
+
+class FakeSpreadsheet:
+    def __init__(self, fake, titles=("On-Trial", "Post-Trial")):
+        self.fake = fake
+        self._worksheets = {title: FakeWorksheet(fake, title) for title in titles}
+
+    def worksheet(self, title):
+        self.fake.call("worksheet")
+        if title not in self._worksheets:
+            raise WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def worksheets(self, **kwargs):
+        self.fake.call("worksheets")
+        return list(self._worksheets.values())
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self.fake.call("add_worksheet")
+        sheet = self._worksheets[title] = FakeWorksheet(self.fake, title)
+        return sheet
+
+
+class FakeSheetsConnection(sheets.SheetsConnection):
+    # A SheetsConnection whose client is the fake; no credentials needed
+    def __init__(self, fake, spreadsheet=None, guard=None):
+        super().__init__(None, "fake://sheet")
+        self.fake = fake
+        self._spreadsheet = spreadsheet or FakeSpreadsheet(fake)
+        if guard is not None:
+            self.writes = guard
+
+    def _connect(self):
+        self._client = self.fake
+
+    def reset(self):
+        with self._lock:
+            self._worksheets.clear()
@@ -0,0 +1,173 @@
+import argparse
+import csv
+import itertools
+import os
+import shutil
+from urllib.parse import quote
+
+import localdb
+import mirror
+import shards
+import survey_schema
+
+# -------------------------------
+# Bulk export from the local mirror
+# -------------------------------
+# Streams each form's rows out of mirror.db in fixed-size chunks, maps the
+# localized answers back to canonical option codes, one-hot encodes the
+# multi-select questions into boolean <key>__<code> columns, and writes
+# hive-style partitions form=<form>/client=<client>/month=<YYYY-MM>, one
+# part file per chunk, as Parquet (needs pyarrow) or CSV. Memory use is
+# bounded by the chunk size, not by the number of responses. Each form is
+# written to a temporary form=<form>.tmp directory that then replaces the
+# previous export, so re-exports never leave stale part files behind.
+#
+#   python export.py exports/ --format parquet --chunk-size 20000
+
+CHUNK_SIZE = 20000
+FORMS = ("on_trial", "post_trial")
+SEPARATOR = "\x1f"
+
+
+def columns_for(form):
+    # Output columns other than the partition keys (client, month)
+    columns = ["timestamp", "language", "submission_id"]
+    if form.treatment_code:
+        columns.append("treatment_code")
+    for field in form.fields:
+        if field.widget == "multiselect":
+            columns += [f"{field.key}__{code}" for code in field.codes]
+        else:
+            columns.append(field.key)
+    return columns
+
+
+def _lookup(form, key):
+    # "<language>\x1f<label>" -> code, so one Series.map covers every language
+    return {
+        f"{language}{SEPARATOR}{label}": form.by_key[key].codes[i]
+        for language, index in form.label_index.items()
+        for label, i in index[key].items()
+    }
+
+
+def normalize(form, chunk):
+    # chunk: DataFrame with form.headers columns -> canonical columnar frame
+    import pandas as pd
+
+    language = chunk[form.column_of("language")]
+    timestamp = chunk[form.column_of("timestamp")]
+    out = pd.DataFrame({
+        "timestamp": timestamp,
+        "language": language,
+        "client": chunk[form.column_of("client")],
+        "month": timestamp.str.slice(0, 7),
+        "submission_id": chunk[form.column_of("submission_id")],
+    })
+    if form.treatment_code:
+        out["treatment_code"] = chunk[form.column_of("treatment_code")]
+    for field in form.fields:
+        answers = chunk[field.column]
+        if field.widget == "radio":
+            out[field.key] = (language + SEPARATOR + answers).map(_lookup(form, field.key))
+        elif field.widget == "multiselect":
+            labels = answers.str.split(", ").explode()
+            codes = (language.reindex(labels.index) + SEPARATOR + labels).map(_lookup(form, field.key))
+            chosen = pd.crosstab(codes.index, codes).astype(bool) if codes.notna().any() else pd.DataFrame()
+            chosen = chosen.reindex(index=chunk.index, columns=list(field.codes), fill_value=False)
+            for code in field.codes:
+                out[f"{field.key}__{code}"] = chosen[code].astype(bool)
+        else:
+            out[field.key] = answers
+    return out
+
+
+def chunks(local, form, size, worksheets=None):
+    import pandas as pd
+
+    columns = list(form.headers)
+    rows = itertools.chain.from_iterable(local.rows(name) for name in worksheets or [form.worksheet])
+    while True:
+        batch = [values + [""] * (len(columns) - len(values)) for _, values in itertools.islice(rows, size)]
+        if not batch:
+            return
+        yield pd.DataFrame([values[:len(columns)] for values in batch], columns=columns)
+
+
+class ParquetSink:
+    extension = "parquet"
+
+    def __init__(self, form):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise SystemExit("Parquet export needs pyarrow (pip install pyarrow), or use --format csv") from e
+        self.pa, self.pq = pa, pq
+        self.schema = pa.schema([
+            (name, pa.bool_() if "__" in name else pa.string()) for name in columns_for(form)
+        ])
+
+    def write(self, path, frame):
+        table = self.pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+        self.pq.write_table(table, path)
+
+
+class CsvSink:
+    extension = "csv"
+
+    def __init__(self, form):
+        self.columns = columns_for(form)
+
+    def write(self, path, frame):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(frame[self.columns].itertuples(index=False, name=None))
+
+
+SINKS = {"parquet": ParquetSink, "csv": CsvSink}
+
+
+def export_form(local, form, out_dir, sink, chunk_size=CHUNK_SIZE, worksheets=None):
+    # worksheets: the form's shard tabs (default: just its base worksheet)
+    written = 0
+    columns = columns_for(form)
+    target = os.path.join(out_dir, f"form={form.name}")
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for part, chunk in enumerate(chunks(local, form, chunk_size, worksheets)):
+        normalized = normalize(form, chunk)
+        for (client, month), group in normalized.groupby(["client", "month"], sort=False):
+            directory = os.path.join(staging, f"client={quote(client, safe='')}", f"month={month or 'unknown'}")
+            os.makedirs(directory, exist_ok=True)
+            sink.write(os.path.join(directory, f"part-{part:05d}.{sink.extension}"), group[columns])
+        written += len(chunk)
+    # Swap in the new export only once it is complete
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export survey responses from the local mirror")
+    parser.add_argument("out_dir")
+    parser.add_argument("--format", choices=sorted(SINKS), default="parquet")
+    parser.add_argument("--form", choices=FORMS, action="append")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    local = mirror.Mirror(localdb.connect(mirror.MIRROR_FILE))
+    directory = shards.open_directory()
+    for name in args.form or FORMS:
+        form = survey_schema.compile_form(name)
+        count = export_form(
+            local, form, args.out_dir, SINKS[args.format](form), args.chunk_size,
+            directory.worksheets(form.worksheet),
+        )
+        print(name, count, "rows")
+
+
+if __name__ == "__main__":
+    main()
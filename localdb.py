@@ -0,0 +1,20 @@
+import os
+import sqlite3
+
+# -------------------------------
+# Local SQLite files
+# -------------------------------
+# Everything kept on the app host (spooled submissions, local copies of
+# responses) lives in one data directory. WAL mode lets several sessions
+# and the background threads read while one of them writes.
+
+DATA_DIR = os.environ.get("FEEDBACK_DATA_DIR", "data")
+
+
+def connect(filename, data_dir=None):
+    data_dir = data_dir or DATA_DIR
+    os.makedirs(data_dir, exist_ok=True)
+    db = sqlite3.connect(os.path.join(data_dir, filename), timeout=30, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=FULL")
+    return db
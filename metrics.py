@@ -0,0 +1,154 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+# -------------------------------
+# Rerun timing and counters
+# -------------------------------
+# Each script run times its phases (setup, render, connect, validation,
+# persistence) into per-(app, language, client) histograms. A background
+# thread logs a JSON snapshot with p50/p95/p99 and all counters every
+# REPORT_INTERVAL seconds on the "feedback.metrics" logger.
+
+REPORT_INTERVAL = float(os.environ.get("FEEDBACK_METRICS_INTERVAL", "60"))
+SLOW_SUBMIT_SECONDS = float(os.environ.get("FEEDBACK_SLOW_SUBMIT_SECONDS", "1.0"))
+
+# Percentiles come from the most recent samples of each series
+RESERVOIR_SIZE = 2048
+
+logger = logging.getLogger("feedback.metrics")
+
+
+def _percentile(ordered, q):
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class Histogram:
+    def __init__(self, size=RESERVOIR_SIZE):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "p50": _percentile(ordered, 50),
+            "p95": _percentile(ordered, 95),
+            "p99": _percentile(ordered, 99),
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = Counter()
+        self.sources = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        with self._lock:
+            self.counters[self._key(name, labels)] += amount
+
+    def add_source(self, name, read):
+        # read() returns a dict of numbers, e.g. QuotaGuard.stats
+        self.sources[name] = read
+
+    def snapshot(self):
+        with self._lock:
+            histograms = [
+                {"name": name, "labels": dict(labels), **histogram.summary()}
+                for (name, labels), histogram in self.histograms.items()
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self.counters.items()
+            ]
+        sources = {}
+        for name, read in list(self.sources.items()):
+            try:
+                sources[name] = read()
+            except Exception as e:
+                sources[name] = {"error": str(e)}
+        return {"time": time.time(), "histograms": histograms, "counters": counters, "sources": sources}
+
+
+REGISTRY = Registry()
+
+
+class RerunTimer:
+    # lap(phase) records the time since the previous lap (or since creation)
+    def __init__(self, app, registry=REGISTRY, **labels):
+        self.registry = registry
+        self.labels = {"app": app, **labels}
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.registry.observe(f"{phase}_seconds", now - self._last, **self.labels)
+        self._last = now
+
+    def increment(self, name):
+        self.registry.increment(name, **self.labels)
+
+    @contextmanager
+    def span(self, phase, slow_after=None, slow_counter=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.registry.observe(f"{phase}_seconds", now - start, **self.labels)
+            if slow_after is not None and now - start > slow_after:
+                self.increment(slow_counter or f"slow_{phase}")
+            self._last = now
+
+
+class Reporter(threading.Thread):
+    def __init__(self, registry=REGISTRY, interval=REPORT_INTERVAL):
+        super().__init__(name="metrics-reporter", daemon=True)
+        self.registry = registry
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            logger.info(json.dumps(self.registry.snapshot(), default=str))
+
+
+@st.cache_resource(show_spinner=False)
+def start_reporter():
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+    reporter = Reporter()
+    reporter.start()
+    return reporter
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import streamlit as st
+
+import localdb
+import metrics
+import shards
+import sheets
+
+# -------------------------------
+# Local mirror of the worksheets
+# -------------------------------
+# sync() copies rows appended since the last watermark with paged
+# batch_get row ranges, several pages per API call. verify=True re-reads
+# the mirrored range in the same pages and compares per-row checksums to
+# pick up edits and deletes made directly in the sheet. Reporting, exports
+# and deduplication read the mirror and never call the API. With sharded
+# worksheets (shards.py) each pass syncs only the tabs written since the
+# previous pass; verifying passes cover every tab. The survey process
+# runs that background sync from startup (spool.get_spool() uses
+# get_mirror()), so the command-line tools read a current mirror.
+
+MIRROR_FILE = "mirror.db"
+PAGE_SIZE = 500
+PAGES_PER_CALL = 4
+SYNC_INTERVAL = float(os.environ.get("FEEDBACK_MIRROR_SYNC_INTERVAL", "300"))
+# Every Nth background sync also verifies checksums of mirrored rows
+VERIFY_EVERY = int(os.environ.get("FEEDBACK_MIRROR_VERIFY_EVERY", "12"))
+
+WORKSHEETS = ("On-Trial", "Post-Trial")
+
+logger = logging.getLogger(__name__)
+
+
+def checksum(values):
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+
+
+def _trim(values):
+    # The API drops trailing empty cells; do the same so checksums agree
+    values = list(values)
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+class Mirror:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        # One sync at a time: the periodic pass and the flusher's reconcile
+        # share this instance
+        self._syncing = threading.Lock()
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS mirror_rows ("
+                " worksheet TEXT NOT NULL, row INTEGER NOT NULL,"
+                " checksum TEXT NOT NULL, cells TEXT NOT NULL,"
+                " PRIMARY KEY (worksheet, row))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS mirror_state ("
+                " worksheet TEXT PRIMARY KEY, watermark INTEGER NOT NULL, synced_at REAL NOT NULL)"
+            )
+
+    def watermark(self, worksheet):
+        found = self.db.execute("SELECT watermark FROM mirror_state WHERE worksheet = ?", (worksheet,)).fetchone()
+        return found[0] if found else 0
+
+    def synced_at(self, worksheet):
+        found = self.db.execute("SELECT synced_at FROM mirror_state WHERE worksheet = ?", (worksheet,)).fetchone()
+        return found[0] if found else None
+
+    def _checksums(self, worksheet, first, last):
+        return dict(self.db.execute(
+            "SELECT row, checksum FROM mirror_rows WHERE worksheet = ? AND row BETWEEN ? AND ?",
+            (worksheet, first, last),
+        ))
+
+    def _fetch(self, connection, worksheet, first_row, pages):
+        # One batch_get for `pages` consecutive pages starting at first_row
+        ranges = [
+            f"{first_row + i * PAGE_SIZE}:{first_row + (i + 1) * PAGE_SIZE - 1}"
+            for i in range(pages)
+        ]
+        results = connection.read(worksheet, lambda sheet: sheet.batch_get(ranges))
+        metrics.REGISTRY.increment("mirror_pages_read", len(ranges), worksheet=worksheet)
+        return [[_trim(values) for values in page] for page in results]
+
+    def _apply(self, worksheet, first_row, rows):
+        # Upsert rows whose checksum changed; returns how many changed
+        known = self._checksums(worksheet, first_row, first_row + len(rows) - 1)
+        changed = []
+        for offset, values in enumerate(rows):
+            digest = checksum(values)
+            if known.get(first_row + offset) != digest:
+                changed.append((worksheet, first_row + offset, digest, json.dumps(values, ensure_ascii=False)))
+        self.db.executemany("INSERT OR REPLACE INTO mirror_rows VALUES (?, ?, ?, ?)", changed)
+        return len(changed)
+
+    def sync(self, connection, worksheet, verify=False):
+        with self._syncing:
+            return self._sync(connection, worksheet, verify)
+
+    def _sync(self, connection, worksheet, verify):
+        start_row = 1 if verify else self.watermark(worksheet) + 1
+        next_row = start_row
+        changed = 0
+        while True:
+            pages = self._fetch(connection, worksheet, next_row, PAGES_PER_CALL)
+            done = False
+            with self._lock, self.db:
+                for page in pages:
+                    changed += self._apply(worksheet, next_row, page)
+                    next_row += len(page)
+                    if len(page) < PAGE_SIZE:
+                        done = True
+                        break
+            if done:
+                break
+        last_row = next_row - 1
+        with self._lock, self.db:
+            if verify:
+                # Rows past the end of the sheet were deleted there
+                deleted = self.db.execute(
+                    "DELETE FROM mirror_rows WHERE worksheet = ? AND row > ?", (worksheet, last_row)
+                ).rowcount
+                changed += deleted
+            self.db.execute(
+                "INSERT OR REPLACE INTO mirror_state VALUES (?, ?, ?)", (worksheet, last_row, time.time())
+            )
+        metrics.REGISTRY.increment("mirror_rows_changed", changed, worksheet=worksheet)
+        return changed
+
+    def rows(self, worksheet, after=1):
+        # Data rows (below the header) in sheet order, straight from SQLite
+        cursor = self.db.execute(
+            "SELECT row, cells FROM mirror_rows WHERE worksheet = ? AND row > ? ORDER BY row",
+            (worksheet, after),
+        )
+        return ((row, json.loads(cells)) for row, cells in cursor)
+
+    def header(self, worksheet):
+        found = self.db.execute(
+            "SELECT cells FROM mirror_rows WHERE worksheet = ? AND row = 1", (worksheet,)
+        ).fetchone()
+        return json.loads(found[0]) if found else []
+
+    def frame(self, worksheet, columns=None):
+        # worksheet: one name or a list of shard tabs, read in that order
+        import pandas as pd
+
+        names = [worksheet] if isinstance(worksheet, str) else list(worksheet)
+        columns = list(columns or self.header(names[0]))
+        data = [values + [""] * (len(columns) - len(values)) for name in names for _, values in self.rows(name)]
+        return pd.DataFrame([values[:len(columns)] for values in data], columns=columns)
+
+
+def shard_worksheets(directory, updated_since=None):
+    return [name for base in WORKSHEETS for name in directory.worksheets(base, updated_since=updated_since)]
+
+
+class MirrorSync(threading.Thread):
+    def __init__(self, mirror, connection, directory, interval=SYNC_INTERVAL):
+        super().__init__(name="mirror-sync", daemon=True)
+        self.mirror = mirror
+        self.connection = connection
+        self.directory = directory
+        self.interval = interval
+
+    def run(self):
+        cycle = 0
+        last_pass = None
+        while True:
+            verify = cycle % VERIFY_EVERY == VERIFY_EVERY - 1
+            started = time.time()
+            # First and verifying passes cover every tab
+            since = None if verify else last_pass
+            for worksheet in shard_worksheets(self.directory, since):
+                try:
+                    self.mirror.sync(self.connection, worksheet, verify=verify)
+                except Exception:
+                    logger.exception("Mirror sync of %s failed", worksheet)
+                    metrics.REGISTRY.increment("mirror_sync_failures", worksheet=worksheet)
+            last_pass = started
+            cycle += 1
+            time.sleep(self.interval)
+
+
+@st.cache_resource(show_spinner=False)
+def get_mirror():
+    mirror = Mirror(localdb.connect(MIRROR_FILE))
+    MirrorSync(mirror, sheets.get_connection(), shards.get_directory()).start()
+    return mirror
+
+
+if __name__ == "__main__":
+    # python mirror.py [--verify]   one sync of every worksheet, then exit
+    mirror = Mirror(localdb.connect(MIRROR_FILE))
+    connection = sheets.get_connection()
+    for name in shard_worksheets(shards.open_directory()):
+        print(name, mirror.sync(connection, name, verify="--verify" in sys.argv[1:]), "rows changed")
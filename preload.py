@@ -0,0 +1,45 @@
+import importlib
+import logging
+import threading
+import time
+
+import streamlit as st
+
+import metrics
+
+# -------------------------------
+# Background import of heavy libraries
+# -------------------------------
+# Module-level imports of the survey pages stop at Streamlit and the
+# standard library, so a cold process shows the form right away. start()
+# imports the Sheets client stack on a daemon thread as soon as the first
+# page loads; the code that needs it (first flush, first sync) imports it
+# again inside the function, which is free once loaded and otherwise just
+# waits on Python's import lock for the background import to finish.
+
+SHEETS_STACK = (
+    "requests",
+    "google.auth.transport.requests",
+    "google.oauth2.service_account",
+    "gspread",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _import_all(modules):
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.exception("Could not preload %s", name)
+            continue
+        metrics.REGISTRY.observe("preload_seconds", time.perf_counter() - start, module=name)
+
+
+@st.cache_resource(show_spinner=False)
+def start(modules=SHEETS_STACK):
+    thread = threading.Thread(target=_import_all, args=(modules,), name="preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+
+# -------------------------------
+# Sheets write quota handling
+# -------------------------------
+# The Sheets API allows a fixed number of write requests per minute per
+# project. Every write in the process goes through one QuotaGuard, which
+# spaces calls with a token bucket sized to that window, retries 429 and
+# 5xx responses with jittered exponential backoff (honoring Retry-After),
+# and stops calling the API for a while after repeated failures.
+
+WRITE_QUOTA_PER_MINUTE = 60
+BURST = 10
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+def status_of(exc):
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def retry_after(exc):
+    # Seconds from a Retry-After header (delta-seconds or HTTP date), if any
+    response = getattr(exc, "response", None)
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc):
+    # requests is imported here, not at module level, to keep page loads light
+    import requests
+
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout)) or status_of(exc) in RETRYABLE_STATUSES
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Blocks until a token is available; returns the time spent waiting
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        # After reset_timeout one trial call is let through ("half open")
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self.clock() - self.opened_at < self.reset_timeout:
+                raise CircuitOpen(f"Sheets calls paused after {self.failures} consecutive failures")
+            self.opened_at = self.clock()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+    def is_open(self):
+        return self.opened_at is not None
+
+
+class QuotaGuard:
+    def __init__(self, bucket=None, breaker=None, max_attempts=5, base_delay=1.0, max_delay=64.0,
+                 sleep=time.sleep, rng=random.random):
+        self.bucket = bucket or TokenBucket((WRITE_QUOTA_PER_MINUTE - BURST) / 60.0, BURST)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {name: self.counters[name] for name in ("calls", "throttled", "retried", "dropped")}
+
+    def backoff(self, attempt, exc):
+        # Full jitter, but never sooner than the server asked for
+        delay = self.rng() * min(self.max_delay, self.base_delay * 2 ** attempt)
+        return max(delay, retry_after(exc) or 0.0)
+
+    def call(self, operation):
+        for attempt in range(self.max_attempts):
+            try:
+                self.breaker.before_call()
+            except CircuitOpen:
+                self._count("dropped")
+                raise
+            if self.bucket.acquire() > 0:
+                self._count("throttled")
+            self._count("calls")
+            try:
+                result = operation()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.breaker.record_failure()
+                if attempt + 1 == self.max_attempts or self.breaker.is_open():
+                    self._count("dropped")
+                    raise
+                self._count("retried")
+                self.sleep(self.backoff(attempt, e))
+            else:
+                self.breaker.record_success()
+                return result
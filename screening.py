@@ -0,0 +1,277 @@
+import concurrent.futures
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+
+import streamlit as st
+
+import localdb
+import metrics
+import textmatch
+
+# -------------------------------
+# Free-text screening
+# -------------------------------
+# The open text answers (every text_area field) are screened off the
+# submit path: Submit only puts the saved row on a queue. A background
+# thread collects what arrived within BATCH_WAIT seconds and sends the
+# batch to a process pool running textmatch.py, which tokenizes and
+# normalizes the texts (casefold, accents dropped, so "Vómitos" and
+# "vomitos" are one term; German umlauts and ß spelled out, so "Übelkeit"
+# and "Uebelkeit" are one term) and matches them against the lexicon. The
+# results go into an inverted index in SQLite (term -> document, position)
+# used for term and phrase search, and lexicon hits are stored as flags.
+#
+# The lexicon is a JSON file of {category: [entries]}. An entry is a word
+# or phrase in any language, and a trailing "*" matches any word ending,
+# e.g. "vomit*". It is re-read when the file changes.
+#
+#   python screening.py reindex         screen every row in the local mirror
+#   python screening.py search <text>   documents containing a term or phrase
+
+SCREENING_FILE = "screening.db"
+LEXICON_PATH = os.environ.get(
+    "FEEDBACK_LEXICON", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicon.json")
+)
+# Processes tokenizing batches; 0 screens on the background thread itself
+WORKERS = int(os.environ.get("FEEDBACK_SCREEN_WORKERS", "2"))
+BATCH_SIZE = int(os.environ.get("FEEDBACK_SCREEN_BATCH_SIZE", "200"))
+BATCH_WAIT = float(os.environ.get("FEEDBACK_SCREEN_BATCH_WAIT", "0.5"))
+
+logger = logging.getLogger(__name__)
+
+
+def documents_of(form, values):
+    # Sheet row -> (submission ID, client, timestamp, [(field key, text)])
+    headers = form.headers
+    values = list(values) + [""] * (len(headers) - len(values))
+    meta = {column: values[i] for i, column in enumerate(headers)}
+    texts = [
+        (field.key, meta[field.column].strip()) for field in form.fields
+        if field.widget == "text_area" and meta[field.column].strip()
+    ]
+    client = meta[form.column_of("client")]
+    timestamp = meta[form.column_of("timestamp")]
+    # Rows saved before submission IDs existed are keyed by time and client
+    submission_id = meta[form.column_of("submission_id")] or f"{timestamp}|{client}"
+    return submission_id, client, timestamp, texts
+
+
+class TextIndex:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " form TEXT NOT NULL, submission_id TEXT NOT NULL, field TEXT NOT NULL,"
+                " client TEXT NOT NULL, submitted_at TEXT NOT NULL, text TEXT NOT NULL,"
+                " UNIQUE (form, submission_id, field))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                " term TEXT NOT NULL, document INTEGER NOT NULL, position INTEGER NOT NULL,"
+                " PRIMARY KEY (term, document, position)) WITHOUT ROWID"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS flags ("
+                " document INTEGER NOT NULL, category TEXT NOT NULL, entry TEXT NOT NULL,"
+                " flagged_at REAL NOT NULL, PRIMARY KEY (document, category, entry))"
+            )
+
+    def add(self, documents):
+        # documents: [(form, submission_id, field, client, submitted_at, text, tokens, hits)];
+        # returns the flags raised as (form, client, field, category, entry).
+        # Already indexed documents are skipped.
+        raised = []
+        now = time.time()
+        with self._lock, self.db:
+            for form, submission_id, field, client, submitted_at, text, tokens, hits in documents:
+                cursor = self.db.execute(
+                    "INSERT OR IGNORE INTO documents"
+                    " (form, submission_id, field, client, submitted_at, text) VALUES (?, ?, ?, ?, ?, ?)",
+                    (form, submission_id, field, client, submitted_at, text),
+                )
+                if not cursor.rowcount:
+                    continue
+                document = cursor.lastrowid
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO postings VALUES (?, ?, ?)",
+                    [(term, document, position) for position, term in enumerate(tokens)],
+                )
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO flags VALUES (?, ?, ?, ?)",
+                    [(document, category, entry, now) for category, entry in hits],
+                )
+                raised += [(form, client, field, category, entry) for category, entry in hits]
+        return raised
+
+    def search(self, query, limit=100):
+        # Documents containing the words of `query` next to each other, newest first
+        terms = textmatch.tokenize(query)
+        if not terms:
+            return []
+        joins = "".join(
+            f" JOIN postings p{i} ON p{i}.document = p0.document"
+            f" AND p{i}.position = p0.position + {i} AND p{i}.term = ?"
+            for i in range(1, len(terms))
+        )
+        with self._lock:
+            return self.db.execute(
+                "SELECT d.form, d.client, d.submitted_at, d.field, d.text FROM documents d"
+                " WHERE d.id IN (SELECT p0.document FROM postings p0" + joins + " WHERE p0.term = ?)"
+                " ORDER BY d.id DESC LIMIT ?",
+                (*terms[1:], terms[0], limit),
+            ).fetchall()
+
+    def flagged(self, form=None, client=None, limit=100):
+        # Latest flagged answers: (form, client, submitted_at, field, text, category, entry)
+        where, params = [], []
+        if form is not None:
+            where.append("d.form = ?")
+            params.append(form)
+        if client is not None:
+            where.append("d.client = ?")
+            params.append(client)
+        with self._lock:
+            return self.db.execute(
+                "SELECT d.form, d.client, d.submitted_at, d.field, d.text, f.category, f.entry"
+                " FROM flags f JOIN documents d ON d.id = f.document"
+                + (" WHERE " + " AND ".join(where) if where else "")
+                + " ORDER BY f.flagged_at DESC, d.id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+
+
+class Screener(threading.Thread):
+    def __init__(self, index, lexicon_path=LEXICON_PATH, workers=WORKERS):
+        super().__init__(name="text-screener", daemon=True)
+        self.index = index
+        self.lexicon_path = lexicon_path
+        self.workers = workers
+        self.queue = queue.Queue()
+        self._lexicon = []
+        self._lexicon_mtime = None
+        self._pool = None
+
+    def submit(self, form, values):
+        # Called from Submit: never blocks, never raises on screening problems
+        self.queue.put((time.perf_counter(), form, values))
+
+    def lexicon(self):
+        try:
+            mtime = os.path.getmtime(self.lexicon_path)
+            if mtime != self._lexicon_mtime:
+                with open(self.lexicon_path, encoding="utf-8") as f:
+                    self._lexicon = textmatch.compile_lexicon(json.load(f))
+                self._lexicon_mtime = mtime
+        except (OSError, ValueError):
+            logger.exception("Could not load the screening lexicon %s", self.lexicon_path)
+        return self._lexicon
+
+    def _screen(self, texts):
+        if not self.workers:
+            return textmatch.screen_batch(self.lexicon(), texts)
+        if self._pool is None:
+            # spawn: forking the threaded Streamlit server is not safe
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        size = max(1, -(-len(texts) // self.workers))
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        work = functools.partial(textmatch.screen_batch, self.lexicon())
+        return [result for chunk in self._pool.map(work, chunks) for result in chunk]
+
+    def process(self, items):
+        # items: [(form, values)] -> flags raised, see TextIndex.add()
+        pending = []
+        for form, values in items:
+            submission_id, client, submitted_at, texts = documents_of(form, values)
+            for key, text in texts:
+                pending.append((form.name, submission_id, key, client, submitted_at, text))
+        if not pending:
+            return []
+        results = self._screen([text for *_, text in pending])
+        raised = self.index.add([
+            document + (tokens, hits) for document, (tokens, hits) in zip(pending, results)
+        ])
+        for flag in raised:
+            logger.warning("%s answer of %s to %s matches %s %r", *flag)
+        metrics.REGISTRY.increment("screening_flags", len(raised))
+        metrics.REGISTRY.increment("screened_texts", len(pending))
+        return raised
+
+    def _collect(self):
+        # Block for the first item, then gather more for up to BATCH_WAIT seconds
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + BATCH_WAIT
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self.process([(form, values) for _, form, values in batch])
+            except Exception:
+                logger.exception("Could not screen %d submissions", len(batch))
+                metrics.REGISTRY.increment("screening_failures")
+                continue
+            now = time.perf_counter()
+            for enqueued, _, _ in batch:
+                metrics.REGISTRY.observe("screening_delay_seconds", now - enqueued)
+
+
+@st.cache_resource(show_spinner=False)
+def get_screener():
+    screener = Screener(TextIndex(localdb.connect(SCREENING_FILE)))
+    screener.start()
+    metrics.REGISTRY.add_source("screening", lambda: {"queued": screener.queue.qsize()})
+    return screener
+
+
+def main():
+    index = TextIndex(localdb.connect(SCREENING_FILE))
+    if sys.argv[1:2] == ["search"] and len(sys.argv) > 2:
+        for row in index.search(" ".join(sys.argv[2:])):
+            print(*row, sep="\t")
+    elif sys.argv[1:] == ["reindex"]:
+        import itertools
+
+        import mirror
+        import shards
+        import survey_schema
+
+        local = mirror.Mirror(localdb.connect(mirror.MIRROR_FILE))
+        directory = shards.open_directory()
+        screener = Screener(index)
+        for name in ("on_trial", "post_trial"):
+            form = survey_schema.compile_form(name)
+            rows = itertools.chain.from_iterable(local.rows(sheet) for sheet in directory.worksheets(form.worksheet))
+            raised = 0
+            while True:
+                batch = [(form, values) for _, values in zip(range(BATCH_SIZE * max(1, WORKERS)), rows)]
+                if not batch:
+                    break
+                raised += len(screener.process(batch))
+            print(name, raised, "flags raised")
+    else:
+        sys.exit("usage: python screening.py reindex | search <text>")
+
+
+if __name__ == "__main__":
+    main()
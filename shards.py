@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+
+import localdb
+import metrics
+import surveys
+
+# -------------------------------
+# Worksheet shards
+# -------------------------------
+# Rows are written to one tab per month, e.g. "On-Trial 2026-10", and with
+# FEEDBACK_SHARD_BY=month,client to one tab per month and client. A shard
+# that reaches MAX_ROWS rolls over to "<shard> #2", "#3" and so on. The
+# flusher creates each tab, with its header row, on its first write (see
+# SheetsConnection.worksheet). The directory in shards.db records every
+# tab with its form, month, client, row count and last write. Reads use it
+# too: the mirror syncs only the tabs written since its last pass, the
+# dashboard's trend index reads only the last few months of tabs, and
+# full rebuilds and exports list every tab of a form. The original
+# "On-Trial" and "Post-Trial" tabs stay in the directory as the oldest
+# shard of their form and are no longer written. FEEDBACK_SHARD_BY=none
+# keeps writing to them instead.
+
+SHARDS_FILE = "shards.db"
+SHARD_BY = os.environ.get("FEEDBACK_SHARD_BY", "month")
+# 50000 rows x ~20 columns stays far below the 10M-cell spreadsheet limit
+MAX_ROWS = int(os.environ.get("FEEDBACK_SHARD_MAX_ROWS", "50000"))
+# Sheets tab titles are limited to 100 characters; leave room for " #NN"
+TITLE_LIMIT = 95
+
+
+def period_of(timestamp):
+    # "2026-10-18 09:30:00" -> "2026-10"
+    return timestamp[:7]
+
+
+def recent_period(months, today=None):
+    # First month of the last `months` months, this one included
+    today = today or datetime.now()
+    index = today.year * 12 + today.month - months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+class ShardDirectory:
+    def __init__(self, db, shard_by=SHARD_BY, max_rows=MAX_ROWS):
+        self.db = db
+        self.by_client = "client" in shard_by.split(",")
+        self.enabled = shard_by != "none"
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS shards ("
+                " worksheet TEXT PRIMARY KEY, shard TEXT NOT NULL, base TEXT NOT NULL,"
+                " period TEXT NOT NULL, client TEXT NOT NULL, seq INTEGER NOT NULL,"
+                " rows INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS shards_by_base ON shards (base, period)")
+
+    def _insert(self, worksheet, shard, base, period, client, seq):
+        self.db.execute(
+            "INSERT OR IGNORE INTO shards VALUES (?, ?, ?, ?, ?, ?, 0, 0)",
+            (worksheet, shard, base, period, client, seq),
+        )
+
+    def register(self, base):
+        # The unsharded tab: oldest data, never rolled over
+        with self._lock, self.db:
+            self._insert(base, base, base, "", "", 1)
+
+    def route(self, base, timestamp, client):
+        # Shard for a new row; the tab to append to is chosen by target()
+        if not self.enabled:
+            return base
+        period = period_of(timestamp)
+        client = client if self.by_client else ""
+        shard = " ".join(part for part in (base, period, client) if part)[:TITLE_LIMIT]
+        with self._lock, self.db:
+            self._insert(shard, shard, base, period, client, 1)
+        return shard
+
+    def target(self, shard, rows):
+        # Tab that takes `rows` more rows of `shard`, rolling over when full
+        with self._lock, self.db:
+            found = self.db.execute(
+                "SELECT worksheet, base, period, client, seq, rows FROM shards"
+                " WHERE shard = ? ORDER BY seq DESC LIMIT 1",
+                (shard,),
+            ).fetchone()
+            if found is None:
+                return shard
+            worksheet, base, period, client, seq, used = found
+            if not period or not used or used + rows <= self.max_rows:
+                return worksheet
+            worksheet = f"{shard} #{seq + 1}"
+            self._insert(worksheet, shard, base, period, client, seq + 1)
+        metrics.REGISTRY.increment("shard_rollovers", base=base)
+        return worksheet
+
+    def added(self, worksheet, rows):
+        with self._lock, self.db:
+            self.db.execute(
+                "UPDATE shards SET rows = rows + ?, updated_at = ? WHERE worksheet = ?",
+                (rows, time.time(), worksheet),
+            )
+
+    def base_of(self, worksheet):
+        with self._lock:
+            found = self.db.execute("SELECT base FROM shards WHERE worksheet = ?", (worksheet,)).fetchone()
+        return found[0] if found else worksheet
+
+    def worksheets(self, base, since=None, client=None, updated_since=None):
+        # Tabs of a form, oldest first. since: tabs that may hold rows from
+        # that "YYYY-MM" on; client: that client's tabs plus the shared ones;
+        # updated_since: only tabs written since that time. Shards are listed
+        # once a first append has landed: route() and target() record them
+        # before the tab exists in the sheet.
+        query = "SELECT worksheet FROM shards WHERE base = ? AND (rows > 0 OR period = '')"
+        params = [base]
+        if since is not None:
+            # The unsharded tab only while no shard predates `since`
+            query += (
+                " AND (period >= ? OR (period = '' AND NOT EXISTS ("
+                "SELECT 1 FROM shards older WHERE older.base = shards.base"
+                " AND older.period != '' AND older.period < ?)))"
+            )
+            params += [since, since]
+        if client is not None:
+            query += " AND client IN ('', ?)"
+            params.append(client)
+        if updated_since is not None:
+            query += " AND updated_at >= ?"
+            params.append(updated_since)
+        with self._lock:
+            return [name for (name,) in self.db.execute(query + " ORDER BY period, client, seq", params)]
+
+    def current(self, base, months=1, client=None):
+        # Tabs that may hold rows from the last `months` months
+        return self.worksheets(base, since=recent_period(months), client=client)
+
+
+def open_directory():
+    directory = ShardDirectory(localdb.connect(SHARDS_FILE))
+    for definition in surveys.FORMS.values():
+        directory.register(definition["worksheet"])
+    return directory
+
+
+@st.cache_resource(show_spinner=False)
+def get_directory():
+    return open_directory()
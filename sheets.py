@@ -0,0 +1,160 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import streamlit as st
+
+import metrics
+import ratelimit
+
+# -------------------------------
+# Shared Google Sheets connection
+# -------------------------------
+# Streamlit re-runs the whole script on every widget click, so the
+# authorized client and worksheet handles are built once per process and
+# shared by every session. Nothing here touches the network until a
+# worksheet is actually read or written. All writes share one QuotaGuard
+# (see ratelimit.py) so sessions cannot exceed the Sheets write quota;
+# reads get a guard of their own. gspread and google-auth are imported
+# on first use, normally already loaded by preload.py in the background,
+# so a page renders without waiting for them.
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+# Refresh the access token this long before it expires
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Grid size of auto-created worksheets; appends grow it as needed
+NEW_WORKSHEET_ROWS = 1000
+
+# Service account fields checked on page load; the key is parsed on first use
+REQUIRED_KEYS = ("client_email", "private_key", "token_uri")
+
+
+def _is_auth_failure(exc):
+    import gspread
+    from google.auth.exceptions import GoogleAuthError
+
+    if isinstance(exc, GoogleAuthError):
+        return True
+    return isinstance(exc, gspread.exceptions.APIError) and exc.code in (401, 403)
+
+
+def _is_reconnect_error(exc):
+    # Errors after which the client is rebuilt and the call retried once
+    import requests
+
+    return _is_auth_failure(exc) or isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+class SheetsConnection:
+    def __init__(self, info, sheet_url):
+        self.info = info
+        self.creds = None
+        self.sheet_url = sheet_url
+        self.headers = {}
+        self._lock = threading.RLock()
+        self._client = None
+        self._spreadsheet = None
+        self._worksheets = {}
+        self.writes = ratelimit.QuotaGuard()
+        self.reads = ratelimit.QuotaGuard()
+
+    def set_headers(self, name, headers):
+        # Header row written once, the first time the worksheet is opened
+        # empty; a missing worksheet with registered headers is created
+        self.headers[name] = list(headers)
+
+    def _credentials(self):
+        if self.creds is None:
+            from google.oauth2.service_account import Credentials
+
+            self.creds = Credentials.from_service_account_info(self.info, scopes=SCOPES)
+        return self.creds
+
+    def _refresh_if_expiring(self):
+        from google.auth.transport.requests import Request
+
+        expiry = self.creds.expiry
+        if expiry is None or not self.creds.valid:
+            self.creds.refresh(Request())
+            return
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=timezone.utc)
+        if expiry - datetime.now(timezone.utc) < TOKEN_REFRESH_MARGIN:
+            self.creds.refresh(Request())
+
+    def _connect(self):
+        if self._client is None:
+            import gspread
+
+            self._client = gspread.authorize(self._credentials())
+            self._spreadsheet = self._client.open_by_url(self.sheet_url)
+        self._refresh_if_expiring()
+
+    def reset(self):
+        with self._lock:
+            self._client = None
+            self._spreadsheet = None
+            self._worksheets.clear()
+
+    def worksheet(self, name):
+        with self._lock:
+            self._connect()
+            sheet = self._worksheets.get(name)
+            if sheet is None:
+                headers = self.headers.get(name)
+                sheet = self._open(name, headers)
+                if headers and (sheet.row_count == 0 or sheet.row_values(1) == []):
+                    sheet.append_row(headers)
+                self._worksheets[name] = sheet
+            return sheet
+
+    def _open(self, name, headers):
+        import gspread
+
+        try:
+            return self._spreadsheet.worksheet(name)
+        except gspread.exceptions.WorksheetNotFound:
+            if not headers:
+                raise
+        metrics.REGISTRY.increment("worksheets_created")
+        return self._spreadsheet.add_worksheet(name, rows=NEW_WORKSHEET_ROWS, cols=len(headers))
+
+    def run(self, name, operation):
+        # Call operation(worksheet), reconnecting once on auth or transport errors
+        try:
+            return operation(self.worksheet(name))
+        except Exception as e:
+            if not _is_reconnect_error(e):
+                raise
+            if _is_auth_failure(e):
+                metrics.REGISTRY.increment("sheets_auth_failures")
+            metrics.REGISTRY.increment("sheets_reconnects")
+            self.reset()
+            return operation(self.worksheet(name))
+
+    def write(self, name, operation):
+        return self.writes.call(lambda: self.run(name, operation))
+
+    def read(self, name, operation):
+        # Reads have their own per-minute quota, so their own bucket
+        return self.reads.call(lambda: self.run(name, operation))
+
+    def append_row(self, name, row):
+        return self.write(name, lambda sheet: sheet.append_row(row))
+
+    def append_rows(self, name, rows):
+        return self.write(name, lambda sheet: sheet.append_rows(rows))
+
+
+@st.cache_resource(show_spinner=False)
+def get_connection():
+    # Missing secrets still fail on page load, before anything is imported
+    info = dict(st.secrets["gcp_service_account"])
+    missing = [key for key in REQUIRED_KEYS if not info.get(key)]
+    if missing:
+        raise ValueError(f"gcp_service_account secret has no {', '.join(missing)}")
+    connection = SheetsConnection(info, st.secrets["sheet"]["url"])
+    metrics.REGISTRY.add_source("sheets_writes", connection.writes.stats)
+    metrics.REGISTRY.add_source("sheets_reads", connection.reads.stats)
+    return connection
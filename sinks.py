@@ -0,0 +1,249 @@
+import abc
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+import streamlit as st
+
+import aggregates
+import localdb
+import metrics
+import screening
+import shards
+import spool
+import store
+
+# -------------------------------
+# Fan-out of submissions to several sinks
+# -------------------------------
+# Each saved response goes to every configured sink. A sink has its own
+# small thread pool, so a slow or hung sink cannot hold up the others.
+# Submit waits only for the required sinks, each up to its timeout. Today
+# that is just the spool, which decides whether the row is new or a
+# duplicate. As soon as the required sinks accept a row, even after Submit
+# gave up waiting, the other sinks get it concurrently in the background:
+# the live tallies and the free-text screener always, the audit log and
+# Excel store as configured. Their latency, failures, late writes and
+# skipped writes go to metrics and status(). A sink that falls more than
+# MAX_PENDING writes behind skips new rows instead of queueing without
+# bound.
+
+SINK_TIMEOUT = float(os.environ.get("FEEDBACK_SINK_TIMEOUT", "10"))
+MAX_PENDING = int(os.environ.get("FEEDBACK_SINK_MAX_PENDING", "100"))
+# Optional sinks to enable, comma separated (see OPTIONAL_SINKS)
+ENABLED = os.environ.get("FEEDBACK_SINKS", "audit,excel")
+
+AUDIT_FILE = "audit.jsonl"
+# Same file name the legacy Feedback script used; one table per worksheet
+EXCEL_FILE = "Feedback.db"
+
+
+class SinkTimeout(Exception):
+    pass
+
+
+class Sink(abc.ABC):
+    name = None
+    required = False
+    timeout = SINK_TIMEOUT
+    workers = 1
+
+    @abc.abstractmethod
+    def write(self, form, row, submission_id):
+        # Returns False if the row was not taken (e.g. a duplicate)
+        ...
+
+
+class SpoolSink(Sink):
+    # Google Sheets, through the write-behind spool, into the row's shard
+    name = "sheets"
+    required = True
+    workers = 4
+
+    def __init__(self, outbox, directory):
+        self.outbox = outbox
+        self.directory = directory
+
+    def write(self, form, row, submission_id):
+        values = dict(zip(form.headers, row))
+        shard = self.directory.route(
+            form.worksheet, values[form.column_of("timestamp")], values[form.column_of("client")]
+        )
+        return self.outbox.put(shard, row, submission_id)
+
+
+class AggregatesSink(Sink):
+    # Live answer counters for the dashboard (aggregates.py)
+    name = "aggregates"
+
+    def __init__(self, tallies):
+        self.tallies = tallies
+
+    def write(self, form, row, submission_id):
+        self.tallies.record(form, row)
+
+
+class ScreeningSink(Sink):
+    # Queues the free-text answers for screening (screening.py)
+    name = "screening"
+
+    def __init__(self, screener):
+        self.screener = screener
+
+    def write(self, form, row, submission_id):
+        self.screener.submit(form, row)
+
+
+class AuditLogSink(Sink):
+    # Append-only JSON lines, synced to disk before the write counts
+    name = "audit"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, form, row, submission_id):
+        line = json.dumps({
+            "at": time.time(),
+            "worksheet": form.worksheet,
+            "submission_id": submission_id,
+            "row": row,
+        }, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ExcelSink(Sink):
+    # store.ResponseStore, exported to .xlsx with `python store.py`
+    name = "excel"
+
+    def __init__(self, db):
+        self.db = db
+        self._stores = {}
+
+    def write(self, form, row, submission_id):
+        table = self._stores.get(form.worksheet)
+        if table is None:
+            table = self._stores[form.worksheet] = store.ResponseStore(self.db, table=form.worksheet)
+        table.append(dict(zip(form.headers, row)))
+
+
+OPTIONAL_SINKS = {
+    "audit": lambda: AuditLogSink(os.path.join(localdb.DATA_DIR, AUDIT_FILE)),
+    "excel": lambda: ExcelSink(localdb.connect(EXCEL_FILE)),
+}
+
+
+class Fanout:
+    def __init__(self, sinks, max_pending=MAX_PENDING):
+        self.sinks = list(sinks)
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executors = {
+            sink.name: concurrent.futures.ThreadPoolExecutor(sink.workers, thread_name_prefix=f"sink-{sink.name}")
+            for sink in self.sinks
+        }
+        self._counts = {sink.name: Counter() for sink in self.sinks}
+        self._last = {sink.name: {} for sink in self.sinks}
+
+    def _run(self, sink, form, row, submission_id):
+        start = time.perf_counter()
+        try:
+            result = sink.write(form, row, submission_id)
+        except Exception as e:
+            self._record(sink, time.perf_counter() - start, error=e)
+            raise
+        self._record(sink, time.perf_counter() - start)
+        return result
+
+    def _record(self, sink, seconds, error=None):
+        metrics.REGISTRY.observe("sink_seconds", seconds, sink=sink.name)
+        with self._lock:
+            counts = self._counts[sink.name]
+            counts["pending"] -= 1
+            counts["failed" if error else "written"] += 1
+            # Required sinks that overrun were already counted by write()
+            late = seconds > sink.timeout and not sink.required
+            if late:
+                counts["late"] += 1
+            self._last[sink.name] = {
+                "seconds": round(seconds, 4),
+                "error": None if error is None else f"{type(error).__name__}: {error}",
+                "at": time.time(),
+            }
+        if error is not None:
+            metrics.REGISTRY.increment("sink_failures", sink=sink.name)
+        if late:
+            metrics.REGISTRY.increment("sink_timeouts", sink=sink.name)
+
+    def _submit(self, sink, form, row, submission_id):
+        with self._lock:
+            counts = self._counts[sink.name]
+            if not sink.required and counts["pending"] >= self.max_pending:
+                counts["skipped"] += 1
+                metrics.REGISTRY.increment("sink_skipped", sink=sink.name)
+                return None
+            counts["pending"] += 1
+        return self._executors[sink.name].submit(self._run, sink, form, row, submission_id)
+
+    def _accepted(self, futures, form, row, submission_id):
+        # Done callback of the required sinks: the last one to finish hands
+        # an accepted row to the other sinks
+        done = []
+
+        def finished(future):
+            with self._lock:
+                done.append(future)
+                if len(done) < len(futures):
+                    return
+            if all(not f.cancelled() and f.exception() is None and f.result() is not False for f in futures):
+                for sink in self.sinks:
+                    if not sink.required:
+                        self._submit(sink, form, row, submission_id)
+
+        return finished
+
+    def write(self, form, row, submission_id):
+        # True once every required sink took the row, False for a duplicate;
+        # raises if a required sink failed or did not answer in time. The
+        # other sinks get the row whenever the required ones accept it.
+        required = [(sink, self._submit(sink, form, row, submission_id)) for sink in self.sinks if sink.required]
+        futures = [future for _, future in required]
+        finished = self._accepted(futures, form, row, submission_id)
+        for future in futures:
+            future.add_done_callback(finished)
+        if not futures:
+            finished(None)
+        accepted = True
+        for sink, future in required:
+            try:
+                accepted = future.result(timeout=sink.timeout) is not False and accepted
+            except concurrent.futures.TimeoutError:
+                metrics.REGISTRY.increment("sink_timeouts", sink=sink.name)
+                raise SinkTimeout(f"{sink.name} did not answer within {sink.timeout:g}s") from None
+        return accepted
+
+    def status(self):
+        with self._lock:
+            return {
+                sink.name: dict(self._counts[sink.name], required=sink.required, last=self._last[sink.name])
+                for sink in self.sinks
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_fanout():
+    names = [name.strip() for name in ENABLED.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(OPTIONAL_SINKS))
+    if unknown:
+        raise ValueError(f"FEEDBACK_SINKS has unknown sinks: {', '.join(unknown)}")
+    required = SpoolSink(spool.get_spool(), shards.get_directory())
+    always = [AggregatesSink(aggregates.get_aggregates()), ScreeningSink(screening.get_screener())]
+    fanout = Fanout([required] + always + [OPTIONAL_SINKS[name]() for name in names])
+    metrics.REGISTRY.add_source("sinks", fanout.status)
+    return fanout
@@ -0,0 +1,263 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import streamlit as st
+
+import localdb
+import metrics
+import mirror
+import ratelimit
+import shards
+import sheets
+import submission_index
+import survey_schema
+import surveys
+
+# -------------------------------
+# Write-behind submission spool
+# -------------------------------
+# Submit only writes the row to a local SQLite spool and returns. A
+# background flusher drains the spool into Google Sheets with one
+# append_rows call per batch. A row is deleted from the spool only after
+# Sheets accepted it, and rows left over from a crash or restart are sent
+# by the next flusher. Rows carry their submission ID: put() refuses an ID
+# that is already queued or persisted, and the flusher skips rows whose ID
+# the index has seen. When an append fails in a way that may still have
+# written the rows (timeouts, 5xx), the next attempt first syncs the new
+# sheet rows into the local mirror and indexes the IDs it finds there, so
+# retries do not duplicate rows. Spooled rows are keyed by shard (see
+# shards.py); the flusher asks the shard directory which tab takes each
+# batch, which rolls a full shard over to a new tab.
+
+SPOOL_FILE = "spool.db"
+MAX_DEPTH = int(os.environ.get("FEEDBACK_SPOOL_MAX_DEPTH", "5000"))
+BATCH_SIZE = int(os.environ.get("FEEDBACK_SPOOL_BATCH_SIZE", "50"))
+FLUSH_INTERVAL = float(os.environ.get("FEEDBACK_SPOOL_FLUSH_INTERVAL", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class SpoolFull(Exception):
+    pass
+
+
+class Spool:
+    def __init__(self, db, index, max_depth=MAX_DEPTH, batch_size=BATCH_SIZE):
+        self.db = db
+        self.index = index
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.wakeup = threading.Event()
+        self._lock = threading.Lock()
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS spool ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " worksheet TEXT NOT NULL,"
+                " row TEXT NOT NULL,"
+                " enqueued_at REAL NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = [column for _, column, *_ in self.db.execute("PRAGMA table_info(spool)")]
+            if "submission_id" not in columns:
+                self.db.execute("ALTER TABLE spool ADD COLUMN submission_id TEXT")
+            self.db.execute("CREATE UNIQUE INDEX IF NOT EXISTS spool_submission ON spool (submission_id)")
+            self._depth = self.db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        if self._depth:
+            self.wakeup.set()
+
+    def depth(self):
+        return self._depth
+
+    def put(self, worksheet, row, submission_id=None):
+        # False if this submission is already queued or saved
+        if submission_id in self.index:
+            return False
+        with self._lock:
+            if self._depth >= self.max_depth:
+                raise SpoolFull(f"{self._depth} submissions are waiting to be saved")
+            with self.db:
+                added = self.db.execute(
+                    "INSERT OR IGNORE INTO spool (worksheet, row, enqueued_at, submission_id) VALUES (?, ?, ?, ?)",
+                    (worksheet, json.dumps(row), time.time(), submission_id),
+                ).rowcount
+            if not added:
+                return False
+            self._depth += 1
+            if self._depth >= self.batch_size:
+                self.wakeup.set()
+            return True
+
+    def worksheets(self):
+        with self._lock:
+            return [name for (name,) in self.db.execute("SELECT DISTINCT worksheet FROM spool")]
+
+    def take(self, worksheet, limit):
+        # Oldest rows first, so each worksheet keeps submission order
+        with self._lock:
+            cursor = self.db.execute(
+                "SELECT id, submission_id, row FROM spool WHERE worksheet = ? ORDER BY id LIMIT ?",
+                (worksheet, limit),
+            )
+            return [(spool_id, submission_id, json.loads(row)) for spool_id, submission_id, row in cursor]
+
+    def ack(self, ids):
+        with self._lock, self.db:
+            self.db.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in ids])
+            self._depth = self.db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def nack(self, ids):
+        with self._lock, self.db:
+            self.db.executemany("UPDATE spool SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+
+
+def _may_have_landed(exc):
+    # Rejected requests (4xx) wrote nothing; timeouts and 5xx may have
+    status = ratelimit.status_of(exc)
+    return status is None or status >= 500
+
+
+class Flusher(threading.Thread):
+    def __init__(self, spool, connection, local=None, directory=None, interval=FLUSH_INTERVAL):
+        super().__init__(name="spool-flusher", daemon=True)
+        self.spool = spool
+        self.connection = connection
+        self.local = local
+        self.directory = directory
+        self.interval = interval
+        self.stopped = threading.Event()
+        # Worksheets whose last append failed ambiguously -> mirror watermark
+        # from before that append
+        self._unsure = {}
+
+    def _reconcile(self, worksheet):
+        # Index the IDs of rows that reached the sheet after the failed append
+        if self.local is None or worksheet not in self._unsure:
+            return
+        headers = self._headers(worksheet) or []
+        if submission_index.COLUMN not in headers:
+            return
+        position = headers.index(submission_index.COLUMN)
+        self.local.sync(self.connection, worksheet)
+        after = max(self._unsure.pop(worksheet), 1)
+        found = [values[position] for _, values in self.local.rows(worksheet, after) if len(values) > position]
+        self.spool.index.add(worksheet, found)
+        # Rows that landed despite the error count toward the shard's size
+        if self.directory is not None and found:
+            self.directory.added(worksheet, len(found))
+        metrics.REGISTRY.increment("flush_reconciles", worksheet=worksheet)
+
+    def _append(self, worksheet, batch):
+        # Sends the rows not yet in the sheet and returns how many; every
+        # retry (rate-limit backoff, reconnect, next flush) re-checks after
+        # an unsure failure
+        def append(sheet):
+            # Including tabs a shard has since rolled over from
+            for name in list(self._unsure):
+                self._reconcile(name)
+            rows = [row for _, submission_id, row in batch if submission_id not in self.spool.index]
+            if not rows:
+                return 0
+            if self.local is not None:
+                self._unsure.setdefault(worksheet, self.local.watermark(worksheet))
+            try:
+                sheet.append_rows(rows)
+            except Exception as e:
+                if not _may_have_landed(e):
+                    self._unsure.pop(worksheet, None)
+                raise
+            # Still unsure until flush() has indexed the IDs
+            return len(rows)
+
+        return self.connection.write(worksheet, append)
+
+    def _headers(self, worksheet):
+        # A shard tab has the header row of its form's worksheet
+        headers = self.connection.headers.get(worksheet)
+        if headers is None and self.directory is not None:
+            headers = self.connection.headers.get(self.directory.base_of(worksheet))
+        return headers
+
+    def _destination(self, shard, rows):
+        # Tab for the next batch of a shard; new tabs get their form's header
+        if self.directory is None:
+            return shard
+        worksheet = self.directory.target(shard, rows)
+        headers = self._headers(worksheet)
+        if headers and worksheet not in self.connection.headers:
+            self.connection.set_headers(worksheet, headers)
+        return worksheet
+
+    def flush(self):
+        # Drain every shard; returns the number of rows delivered
+        delivered = 0
+        for shard in self.spool.worksheets():
+            while True:
+                batch = self.spool.take(shard, self.spool.batch_size)
+                if not batch:
+                    break
+                ids = [spool_id for spool_id, _, _ in batch]
+                start = time.perf_counter()
+                worksheet = self._destination(shard, len(batch))
+                try:
+                    sent = self._append(worksheet, batch)
+                except ratelimit.CircuitOpen as e:
+                    logger.warning("Not flushing %s: %s", worksheet, e)
+                    return delivered
+                except Exception:
+                    logger.exception("Could not flush %d rows to %s; will retry", len(batch), worksheet)
+                    metrics.REGISTRY.increment("flush_failures", worksheet=worksheet)
+                    self.spool.nack(ids)
+                    break
+                # Indexed before the spool forgets them, so a crash in between
+                # cannot lead to a second copy; if indexing fails, the next
+                # attempt reconciles the rows that landed
+                self.spool.index.add(worksheet, [submission_id for _, submission_id, _ in batch])
+                self._unsure.pop(worksheet, None)
+                self.spool.ack(ids)
+                if self.directory is not None:
+                    self.directory.added(worksheet, sent)
+                delivered += len(batch)
+                metrics.REGISTRY.observe("append_rows_seconds", time.perf_counter() - start, worksheet=worksheet)
+                metrics.REGISTRY.increment("rows_flushed", sent, worksheet=worksheet)
+                if sent < len(batch):
+                    metrics.REGISTRY.increment("duplicate_rows_skipped", len(batch) - sent, worksheet=worksheet)
+        return delivered
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.spool.wakeup.wait(self.interval)
+            self.spool.wakeup.clear()
+            if not self.spool.depth():
+                continue
+            # Local errors (e.g. "database is locked") must not end the
+            # thread while the spool keeps accepting submissions
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing the spool failed; will retry")
+                metrics.REGISTRY.increment("flush_failures")
+
+    def stop(self):
+        self.stopped.set()
+        self.spool.wakeup.set()
+
+
+@st.cache_resource(show_spinner=False)
+def get_spool():
+    outbox = Spool(localdb.connect(SPOOL_FILE), submission_index.get_index())
+    # Reconciling reads the mirror; get_mirror() also keeps it synced in the
+    # background, so exports and rebuilds find it current
+    local = mirror.get_mirror()
+    connection = sheets.get_connection()
+    # Headers of every form before the first flush: rows left in the spool
+    # may be for a form, or a new shard tab, no page has opened yet
+    for name in surveys.FORMS:
+        form = survey_schema.compile_form(name)
+        connection.set_headers(form.worksheet, form.headers)
+    Flusher(outbox, connection, local, shards.get_directory()).start()
+    metrics.REGISTRY.add_source("spool", lambda: {"depth": outbox.depth()})
+    return outbox
@@ -0,0 +1,169 @@
+import os
+import sys
+import threading
+
+import streamlit as st
+
+import localdb
+
+# -------------------------------
+# Append-only local response store
+# -------------------------------
+# Each submission is one INSERT into a SQLite table whose columns are the
+# keys of the response dict, so saving costs the same on the first and the
+# ten-thousandth response and concurrent sessions cannot overwrite each
+# other. The Excel workbook is produced on demand by export_xlsx(), using
+# column widths kept up to date as rows are appended. An empty store first
+# imports the Feedback.xlsx the old script rewrote on every submission, so
+# exporting over that file keeps the earlier responses.
+
+# Extra characters added to the longest value, as the old auto-sizing did
+WIDTH_PADDING = 2
+# Workbook the old script kept next to the store
+LEGACY_XLSX = "Feedback.xlsx"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ResponseStore:
+    def __init__(self, db, table="responses"):
+        self.db = db
+        self.table = table
+        self.widths_table = table + "_widths"
+        self._lock = threading.Lock()
+        with self._lock, self.db:
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} (id INTEGER PRIMARY KEY AUTOINCREMENT)")
+            self.db.execute(
+                f"CREATE TABLE IF NOT EXISTS {_quote(self.widths_table)}"
+                " (name TEXT PRIMARY KEY, width INTEGER NOT NULL)"
+            )
+            self._columns = self._read_columns()
+            if self._columns and not self.widths():
+                self._backfill_widths()
+
+    def _backfill_widths(self):
+        # Stores created before widths were tracked: one scan, then incremental
+        for name in self._columns:
+            width = self.db.execute(
+                f"SELECT MAX(LENGTH({_quote(name)})) FROM {_quote(self.table)}"
+            ).fetchone()[0]
+            self.db.execute(
+                f"INSERT INTO {_quote(self.widths_table)} (name, width) VALUES (?, ?)",
+                (name, max(len(name), width or 0)),
+            )
+
+    def _read_columns(self):
+        info = self.db.execute(f"PRAGMA table_info({_quote(self.table)})").fetchall()
+        return [row[1] for row in info if row[1] != "id"]
+
+    def columns(self):
+        return list(self._columns)
+
+    def _add_columns(self, names):
+        # Another process may have added them already
+        self._columns = self._read_columns()
+        for name in names:
+            if name not in self._columns:
+                self.db.execute(f"ALTER TABLE {_quote(self.table)} ADD COLUMN {_quote(name)} TEXT")
+                self._columns.append(name)
+
+    def append(self, response):
+        with self._lock, self.db:
+            self._insert(response)
+
+    def _insert(self, response):
+        names = list(response)
+        if any(name not in self._columns for name in names):
+            self._add_columns(names)
+        self.db.execute(
+            f"INSERT INTO {_quote(self.table)} ({', '.join(map(_quote, names))})"
+            f" VALUES ({', '.join('?' * len(names))})",
+            [response[name] for name in names],
+        )
+        self._widen(response)
+
+    def import_xlsx(self, file_path):
+        # One-time backfill, only into an empty store; returns rows imported
+        from openpyxl import load_workbook
+
+        wb = load_workbook(file_path, read_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            columns = [(i, str(name)) for i, name in enumerate(header) if name is not None]
+            count = 0
+            with self._lock, self.db:
+                if self.db.execute(f"SELECT 1 FROM {_quote(self.table)} LIMIT 1").fetchone():
+                    return 0
+                for values in rows:
+                    if all(value is None for value in values):
+                        continue
+                    self._insert({
+                        name: None if i >= len(values) or values[i] is None else str(values[i])
+                        for i, name in columns
+                    })
+                    count += 1
+            return count
+        finally:
+            wb.close()
+
+    def _widen(self, response):
+        # Running max of str(value) per column; the header counts as a value
+        self.db.executemany(
+            f"INSERT INTO {_quote(self.widths_table)} (name, width) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET width = MAX(width, excluded.width)",
+            [
+                (name, max(len(name), len(str(value)) if value else 0))
+                for name, value in response.items()
+            ],
+        )
+
+    def widths(self):
+        return dict(self.db.execute(f"SELECT name, width FROM {_quote(self.widths_table)}"))
+
+    def rows(self):
+        # Streams rows in submission order without loading the table
+        columns = self.columns()
+        cursor = self.db.execute(
+            f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(self.table)} ORDER BY id"
+        )
+        return columns, cursor
+
+    def export_xlsx(self, file_path):
+        from openpyxl import Workbook
+        from openpyxl.utils import get_column_letter
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        widths = self.widths()
+        columns, cursor = self.rows()
+        # Write-only sheets take column widths before the first row
+        for i, name in enumerate(columns, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = widths.get(name, len(name)) + WIDTH_PADDING
+        ws.append(columns)
+        for row in cursor:
+            ws.append(list(row))
+        wb.save(file_path)
+
+
+@st.cache_resource(show_spinner=False)
+def get_store(data_dir, filename="Feedback.db"):
+    store = ResponseStore(localdb.connect(filename, data_dir))
+    legacy = os.path.join(data_dir, LEGACY_XLSX)
+    if os.path.exists(legacy):
+        store.import_xlsx(legacy)
+    return store
+
+
+if __name__ == "__main__":
+    # python store.py <folder> <Feedback.xlsx> [table]
+    # (table: "responses" for the legacy script, a worksheet name for sinks.py)
+    data_dir, file_path = sys.argv[1], sys.argv[2]
+    table = sys.argv[3] if len(sys.argv) > 3 else "responses"
+    store = ResponseStore(localdb.connect("Feedback.db", data_dir), table=table)
+    # Never overwrite a workbook whose rows an empty store has not imported
+    if os.path.exists(file_path):
+        store.import_xlsx(file_path)
+    store.export_xlsx(file_path)
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+import localdb
+
+# -------------------------------
+# Index of persisted submission IDs
+# -------------------------------
+# Every form session carries a random submission ID that is written with
+# its row. Once Sheets has accepted a row its ID is recorded here, so a
+# double click, a browser retry or a flusher retry after a write that
+# timed out but landed costs one lookup instead of a duplicate row. The
+# most recent IDs are kept in memory, all of them in SQLite, and an
+# optional Bloom filter answers "never seen" without touching the disk.
+
+SUBMISSIONS_FILE = "submissions.db"
+# Sheet column the ID is written to (see the "suffix" in surveys.py)
+COLUMN = "Submission ID"
+MEMORY_SIZE = int(os.environ.get("FEEDBACK_INDEX_MEMORY_SIZE", "10000"))
+USE_BLOOM = os.environ.get("FEEDBACK_INDEX_BLOOM", "1") == "1"
+# 2**23 bits (1 MiB) and 7 hashes: ~1% false positives at 800k IDs
+BLOOM_BITS = 1 << 23
+BLOOM_HASHES = 7
+
+
+class BloomFilter:
+    def __init__(self, bits=BLOOM_BITS, hashes=BLOOM_HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray(bits // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.array[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class SubmissionIndex:
+    def __init__(self, db, memory_size=MEMORY_SIZE, use_bloom=USE_BLOOM):
+        self.db = db
+        self.memory_size = memory_size
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self.bloom = BloomFilter() if use_bloom else None
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS submissions ("
+                " id TEXT PRIMARY KEY, worksheet TEXT NOT NULL, persisted_at REAL NOT NULL)"
+            )
+            if self.bloom is not None:
+                for (submission_id,) in self.db.execute("SELECT id FROM submissions"):
+                    self.bloom.add(submission_id)
+
+    def _remember(self, submission_id):
+        self._recent[submission_id] = None
+        self._recent.move_to_end(submission_id)
+        if len(self._recent) > self.memory_size:
+            self._recent.popitem(last=False)
+
+    def __contains__(self, submission_id):
+        if not submission_id:
+            return False
+        with self._lock:
+            if submission_id in self._recent:
+                return True
+            if self.bloom is not None and submission_id not in self.bloom:
+                return False
+            found = self.db.execute("SELECT 1 FROM submissions WHERE id = ?", (submission_id,)).fetchone()
+            if found:
+                self._remember(submission_id)
+            return found is not None
+
+    def add(self, worksheet, submission_ids):
+        submission_ids = [i for i in submission_ids if i]
+        now = time.time()
+        with self._lock:
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO submissions VALUES (?, ?, ?)",
+                    [(i, worksheet, now) for i in submission_ids],
+                )
+            for submission_id in submission_ids:
+                self._remember(submission_id)
+                if self.bloom is not None:
+                    self.bloom.add(submission_id)
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+
+
+@st.cache_resource(show_spinner=False)
+def get_index():
+    return SubmissionIndex(localdb.connect(SUBMISSIONS_FILE))
@@ -0,0 +1,56 @@
+import uuid
+
+import streamlit as st
+
+# -------------------------------
+# Rendering a compiled survey form
+# -------------------------------
+# Choice widgets take option indices as values and show the localized
+# label through format_func, so the answer survives a language switch.
+# Each form session also gets a submission ID, kept until the form is
+# cleared after a successful submit, so resubmitting the same answers is
+# recognised as a duplicate. The ID is kept per form because one session
+# can fill in both forms when they are served by app.py.
+
+WIDGETS = {
+    "radio": st.radio,
+    "multiselect": st.multiselect,
+    "text_area": st.text_area,
+    "text_input": st.text_input,
+}
+
+
+def _submission_key(form):
+    return f"{form.name}_submission_id"
+
+
+def submission_id(form):
+    return st.session_state[_submission_key(form)]
+
+
+def init_state(form):
+    for field in form.fields:
+        if field.key not in st.session_state:
+            st.session_state[field.key] = field.default
+    if _submission_key(form) not in st.session_state:
+        st.session_state[_submission_key(form)] = uuid.uuid4().hex
+
+
+def clear_state(form):
+    for key in form.keys + (_submission_key(form),):
+        if key in st.session_state:
+            del st.session_state[key]
+
+
+def render(form, language):
+    locale = form.locale(language)
+    for field in form.fields:
+        if not form.is_visible(field, st.session_state):
+            continue
+        if field.key in locale.options:
+            labels = locale.options[field.key]
+            WIDGETS[field.widget](
+                locale[field.label], range(len(labels)), format_func=labels.__getitem__, key=field.key
+            )
+        else:
+            WIDGETS[field.widget](locale[field.label], key=field.key)
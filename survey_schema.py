@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+
+import surveys
+
+# -------------------------------
+# Compiled survey schema
+# -------------------------------
+# compile_form() turns a definition from surveys.py into frozen lookup
+# tables once per process. Widgets keep option *indices* in session state,
+# so follow-up conditions are set lookups and switching language keeps the
+# answers; localized labels are only produced when a row is written.
+
+CHOICE_WIDGETS = ("radio", "multiselect")
+
+
+@dataclass(frozen=True)
+class Field:
+    key: str
+    label: str
+    widget: str
+    column: str
+    required: bool = False
+    codes: tuple = ()
+    parent: str = None
+    show_when: frozenset = frozenset()
+    worse: str = None
+
+    @property
+    def default(self):
+        if self.widget == "multiselect":
+            return []
+        if self.widget == "radio":
+            return None
+        return ""
+
+    def severity(self, index):
+        # Option index on an ordered scale -> 0 (best) .. len(codes) - 1 (worst)
+        return index if self.worse == "last" else len(self.codes) - 1 - index
+
+
+@dataclass(frozen=True)
+class Locale:
+    language: str
+    text: MappingProxyType
+    options: MappingProxyType
+
+    def __getitem__(self, key):
+        return self.text[key]
+
+
+@dataclass(frozen=True)
+class Form:
+    name: str
+    worksheet: str
+    treatment_code: str
+    prefix: tuple
+    fields: tuple
+    suffix: tuple
+    locales: MappingProxyType
+    by_key: MappingProxyType
+    label_index: MappingProxyType
+
+    @property
+    def languages(self):
+        return tuple(self.locales)
+
+    @property
+    def keys(self):
+        return tuple(field.key for field in self.fields)
+
+    @property
+    def required_keys(self):
+        return tuple(field.key for field in self.fields if field.required)
+
+    @property
+    def ordinal_fields(self):
+        return tuple(field for field in self.fields if field.worse)
+
+    @property
+    def headers(self):
+        return (
+            tuple(column for column, _ in self.prefix)
+            + tuple(field.column for field in self.fields)
+            + tuple(column for column, _ in self.suffix)
+        )
+
+    def column_of(self, source):
+        # Sheet column holding a prefix/suffix value such as "client"
+        for column, name in self.prefix + self.suffix:
+            if name == source:
+                return column
+        raise KeyError(source)
+
+    def locale(self, language):
+        return self.locales[language]
+
+    def is_visible(self, field, state):
+        if field.parent is None:
+            return True
+        value = state.get(field.parent)
+        if isinstance(value, list):
+            return not field.show_when.isdisjoint(value)
+        return value in field.show_when
+
+    def missing(self, state):
+        return [key for key in self.required_keys if state.get(key) in (None, "", [])]
+
+    def answer(self, field, value, language):
+        # Session-state value -> text written to the sheet
+        if field.widget == "radio":
+            return "" if value is None else self.locales[language].options[field.key][value]
+        if field.widget == "multiselect":
+            labels = self.locales[language].options[field.key]
+            return ", ".join(labels[i] for i in value)
+        return value or ""
+
+    def row(self, state, language, client, timestamp, submission_id=""):
+        meta = {
+            "timestamp": timestamp,
+            "client": client,
+            "treatment_code": self.treatment_code,
+            "language": language,
+            "submission_id": submission_id,
+        }
+        row = [meta[source] for _, source in self.prefix]
+        for field in self.fields:
+            value = state.get(field.key, field.default) if self.is_visible(field, state) else field.default
+            row.append(self.answer(field, value, language))
+        return row + [meta[source] for _, source in self.suffix]
+
+    def code_of(self, key, label, language):
+        # Localized answer label -> canonical option code (None if unknown)
+        index = self.label_index[language][key].get(label)
+        return None if index is None else self.by_key[key].codes[index]
+
+
+def _compile_fields(definition):
+    fields = []
+    codes = {}
+    for spec in definition["fields"]:
+        parent, show_codes = spec.get("show_if", (None, ()))
+        show_when = frozenset(codes[parent].index(code) for code in show_codes) if parent else frozenset()
+        field = Field(
+            key=spec["key"],
+            label=spec["label"],
+            widget=spec["widget"],
+            column=spec["column"],
+            required=spec.get("required", False),
+            codes=tuple(spec.get("options", ())),
+            parent=parent,
+            show_when=show_when,
+            worse=spec.get("worse"),
+        )
+        if field.worse not in (None, "first", "last") or (field.worse and field.widget != "radio"):
+            raise ValueError(f"{field.key}: 'worse' needs a radio field and 'first' or 'last'")
+        codes[field.key] = field.codes
+        fields.append(field)
+    return tuple(fields)
+
+
+def _compile_locale(language, text, fields):
+    options = {}
+    for field in fields:
+        if field.label not in text:
+            raise ValueError(f"{language} has no text for {field.label!r}")
+        if field.widget in CHOICE_WIDGETS:
+            labels = tuple(text[f"{field.label}_options"])
+            if len(labels) != len(field.codes):
+                raise ValueError(f"{language} {field.label}_options has {len(labels)} labels for {len(field.codes)} codes")
+            options[field.key] = labels
+    return Locale(language, MappingProxyType(dict(text)), MappingProxyType(options))
+
+
+@lru_cache(maxsize=None)
+def compile_form(name):
+    definition = surveys.FORMS[name]
+    fields = _compile_fields(definition)
+    locales = {
+        language: _compile_locale(language, text, fields)
+        for language, text in definition["text"].items()
+    }
+    label_index = {
+        language: MappingProxyType({
+            key: MappingProxyType({label: i for i, label in enumerate(labels)})
+            for key, labels in locale.options.items()
+        })
+        for language, locale in locales.items()
+    }
+    return Form(
+        name=name,
+        worksheet=definition["worksheet"],
+        treatment_code=definition.get("treatment_code", ""),
+        prefix=tuple(definition["prefix"]),
+        fields=fields,
+        suffix=tuple(definition.get("suffix", ())),
+        locales=MappingProxyType(locales),
+        by_key=MappingProxyType({field.key: field for field in fields}),
+        label_index=MappingProxyType(label_index),
+    )
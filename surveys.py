@@ -0,0 +1,309 @@
+# -------------------------------
+# Survey definitions
+# -------------------------------
+# Declarative description of both trial forms: the questions in display
+# order, their canonical option codes, conditional follow-ups and the sheet
+# column each answer goes to. Option labels per language live in the
+# *_TEXT tables; "options": ["yes", "no"] refers to the "<label>_options"
+# list of every language, position by position. "worse" marks an ordered
+# scale for trend tracking: "last" if later options are worse, "first" if
+# earlier ones are. survey_schema.py compiles these into immutable lookup
+# tables once per process.
+
+ON_TRIAL_TEXT = {
+    "English": {
+        "title": "Ongoing Clinical Trial Feedback",
+        "submit": "Submit",
+        "success": "Thank you for your feedback!",
+        "warning": "Please select valid options for all questions before submitting.",
+        "error": "An error occurred while saving your feedback:",
+        "q1": "Have you noticed any new symptoms or changes in your health since your last visit?",
+        "q1_desc": "If yes, please describe:",
+        "q1_options": ["Yes", "No"],
+        "q2": "Are the side effects becoming more or less manageable over time?",
+        "q2_options": ["Much More Manageable", "Slightly More Manageable", "No Change", "Slightly Less Manageable", "Much Less Manageable"],
+        "q3": "Do you feel physically and emotionally supported during the study?",
+        "q3_options": ["Strongly Agree", "Agree", "Neutral", "Disagree", "Strongly Disagree"],
+        "q4": "Has your participation affected your ability to perform daily tasks this week?",
+        "q4_options": ["Not at All", "Slightly", "Moderately", "Significantly", "Extremely"],
+        "q5": "Are there any specific activities you’ve had to avoid due to the study?",
+        "q5_desc": "If yes, please specify:",
+        "q5_options": ["Yes", "No"],
+        "q6": "Do you feel adequately informed about upcoming procedures or visits?",
+        "q6_options": ["Very Well Informed", "Well Informed", "Somewhat Informed", "Poorly Informed", "Not Informed at All"],
+        "q7": "Is the study team responsive to your questions or concerns?",
+        "q7_options": ["Always", "Often", "Sometimes", "Rarely", "Never"],
+        "q8": "What keeps you motivated to continue participating? (Select all that apply)",
+        "q8_options": ["Personal health improvement", "Contribution to science", "Support from study staff", "Financial compensation", "Other"],
+        "q8_other": "Other (please specify):",
+
+    },
+    "Spanish": {
+        "title": "Ensayos Clínicos - Retroalimentación Durante el Ensayo",
+        "submit": "Enviar",
+        "success": "¡Gracias por su retroalimentación!",
+        "warning": "Por favor seleccione opciones válidas para todas las preguntas antes de enviar.",
+        "error": "Ocurrió un error al guardar su retroalimentación:",
+        "q1": "¿Ha notado nuevos síntomas o cambios en su salud desde su última visita?",
+        "q1_desc": "Si es así, por favor descríbalos:",
+        "q1_options": ["Sí", "No"],
+        "q2": "¿Los efectos secundarios se han vuelto más o menos manejables con el tiempo?",
+        "q2_options": ["Mucho más manejables", "Un poco más manejables", "Sin cambios", "Un poco menos manejables", "Mucho menos manejables"],
+        "q3": "¿Se siente física y emocionalmente apoyado durante el estudio?",
+        "q3_options": ["Totalmente de acuerdo", "De acuerdo", "Neutral", "En desacuerdo", "Totalmente en desacuerdo"],
+        "q4": "¿Su participación ha afectado su capacidad para realizar tareas diarias esta semana?",
+        "q4_options": ["En absoluto", "Levemente", "Moderadamente", "Significativamente", "Extremadamente"],
+        "q5": "¿Ha tenido que evitar actividades específicas debido al estudio?",
+        "q5_desc": "Si es así, por favor especifique:",
+        "q5_options": ["Sí", "No"],
+        "q6": "¿Se siente adecuadamente informado sobre los procedimientos o visitas próximas?",
+        "q6_options": ["Muy bien informado", "Bien informado", "Algo informado", "Mal informado", "Nada informado"],
+        "q7": "¿El equipo del estudio responde a sus preguntas o inquietudes?",
+        "q7_options": ["Siempre", "Frecuentemente", "A veces", "Raramente", "Nunca"],
+        "q8": "¿Qué le motiva a seguir participando? (Seleccione todas las que correspondan)",
+        "q8_options": ["Mejora de la salud personal", "Contribución a la ciencia", "Apoyo del personal del estudio", "Compensación económica", "Otro"],
+        "q8_other": "Otro (por favor especifique):",
+
+    },
+    "German": {
+        "title": "Klinische Studien - Feedback während des Versuchs",
+        "submit": "Absenden",
+        "success": "Vielen Dank für Ihr Feedback!",
+        "warning": "Bitte wählen Sie gültige Optionen für alle Fragen aus, bevor Sie absenden.",
+        "error": "Beim Speichern Ihres Feedbacks ist ein Fehler aufgetreten:",
+        "q1": "Haben Sie seit Ihrem letzten Besuch neue Symptome oder Veränderungen Ihrer Gesundheit bemerkt?",
+        "q1_desc": "Wenn ja, bitte beschreiben Sie:",
+        "q1_options": ["Ja", "Nein"],
+        "q2": "Sind die Nebenwirkungen im Laufe der Zeit besser oder schlechter zu bewältigen?",
+        "q2_options": ["Viel besser", "Etwas besser", "Keine Veränderung", "Etwas schlechter", "Viel schlechter"],
+        "q3": "Fühlen Sie sich während der Studie körperlich und emotional unterstützt?",
+        "q3_options": ["Stimme voll zu", "Stimme zu", "Neutral", "Stimme nicht zu", "Stimme überhaupt nicht zu"],
+        "q4": "Hat Ihre Teilnahme Ihre Fähigkeit beeinträchtigt, alltägliche Aufgaben diese Woche zu erledigen?",
+        "q4_options": ["Gar nicht", "Leicht", "Mäßig", "Deutlich", "Extrem"],
+        "q5": "Gab es bestimmte Aktivitäten, die Sie aufgrund der Studie vermeiden mussten?",
+        "q5_desc": "Wenn ja, bitte geben Sie diese an:",
+        "q5_options": ["Ja", "Nein"],
+        "q6": "Fühlen Sie sich ausreichend über bevorstehende Verfahren oder Besuche informiert?",
+        "q6_options": ["Sehr gut informiert", "Gut informiert", "Etwas informiert", "Schlecht informiert", "Gar nicht informiert"],
+        "q7": "Reagiert das Studienteam auf Ihre Fragen oder Anliegen?",
+        "q7_options": ["Immer", "Oft", "Manchmal", "Selten", "Nie"],
+        "q8": "Was motiviert Sie, weiterhin teilzunehmen? (Wählen Sie alle zutreffenden Optionen)",
+        "q8_options": ["Verbesserung der eigenen Gesundheit", "Beitrag zur Wissenschaft", "Unterstützung durch das Studienteam", "Finanzielle Entschädigung", "Sonstiges"],
+        "q8_other": "Sonstiges (bitte angeben):",
+
+    }
+}
+
+
+POST_TRIAL_TEXT = {
+    "English": {
+        "title": "Post Clinical Trial Feedback",
+        "submit": "Submit",
+        "success": "Thank you for your feedback!",
+        "warning": "Please select valid options for all required questions before submitting.",
+        "error": "An error occurred while saving your feedback:",
+
+        "q1": "Looking back, how would you describe your overall experience in the study?",
+        "q1_options": ["Very Positive", "Positive", "Neutral", "Negative", "Very Negative"],
+
+        "q2": "What were the most valuable aspects of your participation? (Select all that apply)",
+        "q2_options": ["Access to treatment", "Learning about my health", "Interaction with study staff", "Contribution to research", "Other"],
+        "q2_other": "Other (please specify):",
+
+        "q3": "Have you noticed any lasting physical or emotional effects since completing the study?",
+        "q3_options": ["Yes – Physical", "Yes – Emotional", "No"],
+        "q3_desc": "If yes, please describe:",
+
+        "q4": "Have you considered dropping out at any point?",
+        "q4_options": ["Yes", "No"],
+        "q4_desc": "If yes, please describe:",
+
+        "q5": "Did the study influence your perspective on clinical research or healthcare?",
+        "q5_options": ["Very Positively", "Positively", "No Impact", "Negatively", "Very Negatively"],
+
+        "q6": "Would you recommend participating in a study like this to others?",
+        "q6_options": ["Definitely", "Probably", "Not Sure", "Probably Not", "Definitely Not"],
+
+        "q7": "What would encourage you to participate in future studies? (Select all that apply)",
+        "q7_options": ["Better communication", "More flexible scheduling", "Clearer expectations", "Support services", "Financial incentives", "Other"],
+        "q7_other": "Other (please specify):",
+
+        "q8": "What improvements would you suggest for future studies?",
+        "q8_desc": "Open-ended:",
+
+        "q9": "Were there any moments during the study that stood out positively or negatively?",
+        "q9_desc": "Open-ended:"
+    },
+    "Spanish": {
+        "title": "Ensayo Clínico - Retroalimentación Post-Estudio",
+        "submit": "Enviar",
+        "success": "¡Gracias por su retroalimentación!",
+        "warning": "Por favor seleccione opciones válidas para todas las preguntas obligatorias antes de enviar.",
+        "error": "Ocurrió un error al guardar su retroalimentación:",
+
+        "q1": "Mirando hacia atrás, ¿cómo describiría su experiencia general en el estudio?",
+        "q1_options": ["Muy Positiva", "Positiva", "Neutral", "Negativa", "Muy Negativa"],
+
+        "q2": "¿Cuáles fueron los aspectos más valiosos de su participación? (Seleccione todos los que correspondan)",
+        "q2_options": ["Acceso al tratamiento", "Aprender sobre mi salud", "Interacción con el personal del estudio", "Contribución a la investigación", "Otro"],
+        "q2_other": "Otro (por favor especifique):",
+
+        "q3": "¿Ha notado efectos físicos o emocionales duraderos desde que completó el estudio?",
+        "q3_options": ["Sí – Físicos", "Sí – Emocionales", "No"],
+        "q3_desc": "Si es así, por favor descríbalos:",
+
+        "q4": "¿Ha considerado abandonar el estudio en algún momento?",
+        "q4_options": ["Sí", "No"],
+        "q4_desc": "Si es así, por favor describa:",
+
+        "q5": "¿El estudio influyó en su perspectiva sobre la investigación clínica o la atención médica?",
+        "q5_options": ["Muy Positivamente", "Positivamente", "Sin Impacto", "Negativamente", "Muy Negativamente"],
+
+        "q6": "¿Recomendaría participar en un estudio como este a otros?",
+        "q6_options": ["Definitivamente", "Probablemente", "No estoy seguro", "Probablemente no", "Definitivamente no"],
+
+        "q7": "¿Qué le animaría a participar en futuros estudios? (Seleccione todos los que correspondan)",
+        "q7_options": ["Mejor comunicación", "Horarios más flexibles", "Expectativas más claras", "Servicios de apoyo", "Incentivos económicos", "Otro"],
+        "q7_other": "Otro (por favor especifique):",
+
+        "q8": "¿Qué mejoras sugeriría para futuros estudios?",
+        "q8_desc": "Abierto:",
+
+        "q9": "¿Hubo algún momento durante el estudio que se destacara positiva o negativamente?",
+        "q9_desc": "Abierto:"
+    },
+    "German": {
+        "title": "Klinische Studie - Feedback nach Abschluss",
+        "submit": "Absenden",
+        "success": "Vielen Dank für Ihr Feedback!",
+        "warning": "Bitte wählen Sie gültige Optionen für alle erforderlichen Fragen aus, bevor Sie absenden.",
+        "error": "Beim Speichern Ihres Feedbacks ist ein Fehler aufgetreten:",
+
+        "q1": "Rückblickend, wie würden Sie Ihre Gesamterfahrung in der Studie beschreiben?",
+        "q1_options": ["Sehr Positiv", "Positiv", "Neutral", "Negativ", "Sehr Negativ"],
+
+        "q2": "Was waren die wertvollsten Aspekte Ihrer Teilnahme? (Mehrfachauswahl möglich)",
+        "q2_options": ["Zugang zur Behandlung", "Über meine Gesundheit lernen", "Interaktion mit dem Studienteam", "Beitrag zur Forschung", "Sonstiges"],
+        "q2_other": "Sonstiges (bitte angeben):",
+
+        "q3": "Haben Sie seit Abschluss der Studie anhaltende körperliche oder emotionale Auswirkungen bemerkt?",
+        "q3_options": ["Ja – Körperlich", "Ja – Emotional", "Nein"],
+        "q3_desc": "Wenn ja, bitte beschreiben:",
+
+        "q4": "Haben Sie jemals darüber nachgedacht, aus der Studie auszusteigen?",
+        "q4_options": ["Ja", "Nein"],
+        "q4_desc": "Wenn ja, bitte beschreiben:",
+
+        "q5": "Hat die Studie Ihre Perspektive auf klinische Forschung oder das Gesundheitswesen beeinflusst?",
+        "q5_options": ["Sehr Positiv", "Positiv", "Keine Auswirkungen", "Negativ", "Sehr Negativ"],
+
+        "q6": "Würden Sie anderen empfehlen, an einer Studie wie dieser teilzunehmen?",
+        "q6_options": ["Definitiv", "Wahrscheinlich", "Nicht sicher", "Wahrscheinlich nicht", "Auf keinen Fall"],
+
+        "q7": "Was würde Sie motivieren, an zukünftigen Studien teilzunehmen? (Mehrfachauswahl möglich)",
+        "q7_options": ["Bessere Kommunikation", "Flexiblere Terminplanung", "Klarere Erwartungen", "Unterstützungsangebote", "Finanzielle Anreize", "Sonstiges"],
+        "q7_other": "Sonstiges (bitte angeben):",
+
+        "q8": "Welche Verbesserungen würden Sie für zukünftige Studien vorschlagen?",
+        "q8_desc": "Offen:",
+
+        "q9": "Gab es während der Studie Momente, die positiv oder negativ auffielen?",
+        "q9_desc": "Offen:"
+    }
+}
+
+
+ON_TRIAL = {
+    "name": "on_trial",
+    "worksheet": "On-Trial",
+    "treatment_code": "36c0c05b",
+    "text": ON_TRIAL_TEXT,
+    "prefix": [
+        ("Timestamp", "timestamp"),
+        ("Client", "client"),
+        ("Treatment Code", "treatment_code"),
+        ("Language", "language"),
+    ],
+    "fields": [
+        {"key": "new_symptoms", "label": "q1", "widget": "radio", "required": True,
+         "column": "NewSymptoms", "worse": "first", "options": ["yes", "no"]},
+        {"key": "new_symptoms_desc", "label": "q1_desc", "widget": "text_area",
+         "column": "NewSymptoms Description", "show_if": ("new_symptoms", ["yes"])},
+        {"key": "side_effects_manageability", "label": "q2", "widget": "radio", "required": True,
+         "column": "SideEffectsManageability", "worse": "last",
+         "options": ["much_more", "slightly_more", "no_change", "slightly_less", "much_less"]},
+        {"key": "support_feeling", "label": "q3", "widget": "radio", "required": True,
+         "column": "SupportFeeling", "worse": "last",
+         "options": ["strongly_agree", "agree", "neutral", "disagree", "strongly_disagree"]},
+        {"key": "daily_tasks_impact", "label": "q4", "widget": "radio", "required": True,
+         "column": "DailyTasksImpact", "worse": "last",
+         "options": ["not_at_all", "slightly", "moderately", "significantly", "extremely"]},
+        {"key": "activities_avoided", "label": "q5", "widget": "radio", "required": True,
+         "column": "ActivitiesAvoided", "worse": "first", "options": ["yes", "no"]},
+        {"key": "activities_avoided_desc", "label": "q5_desc", "widget": "text_area",
+         "column": "ActivitiesAvoided Description", "show_if": ("activities_avoided", ["yes"])},
+        {"key": "informed_about_procedures", "label": "q6", "widget": "radio", "required": True,
+         "column": "InformedAboutProcedures", "worse": "last",
+         "options": ["very_well", "well", "somewhat", "poorly", "not_at_all"]},
+        {"key": "team_responsiveness", "label": "q7", "widget": "radio", "required": True,
+         "column": "TeamResponsiveness", "worse": "last",
+         "options": ["always", "often", "sometimes", "rarely", "never"]},
+        {"key": "motivation_factors", "label": "q8", "widget": "multiselect", "required": True,
+         "column": "MotivationFactors",
+         "options": ["health_improvement", "science", "staff_support", "compensation", "other"]},
+        {"key": "motivation_other", "label": "q8_other", "widget": "text_input",
+         "column": "Other", "show_if": ("motivation_factors", ["other"])},
+    ],
+    # After the answers, so rows written before it existed keep their layout
+    "suffix": [
+        ("Submission ID", "submission_id"),
+    ],
+}
+
+POST_TRIAL = {
+    "name": "post_trial",
+    "worksheet": "Post-Trial",
+    "text": POST_TRIAL_TEXT,
+    "prefix": [
+        ("Timestamp", "timestamp"),
+        ("Participant ID / Code", "client"),
+        ("Language", "language"),
+    ],
+    "fields": [
+        {"key": "q1", "label": "q1", "widget": "radio", "required": True,
+         "column": "Overall Experience",
+         "options": ["very_positive", "positive", "neutral", "negative", "very_negative"]},
+        {"key": "q2", "label": "q2", "widget": "multiselect", "required": True,
+         "column": "Valuable Aspects",
+         "options": ["treatment_access", "health_learning", "staff_interaction", "research_contribution", "other"]},
+        {"key": "q2_other", "label": "q2_other", "widget": "text_input",
+         "column": "Valuable Aspects - Other", "show_if": ("q2", ["other"])},
+        {"key": "q3", "label": "q3", "widget": "radio", "required": True,
+         "column": "Lasting Effects", "options": ["yes_physical", "yes_emotional", "no"]},
+        {"key": "q3_desc", "label": "q3_desc", "widget": "text_area",
+         "column": "Lasting Effects - Description", "show_if": ("q3", ["yes_physical", "yes_emotional"])},
+        {"key": "q4", "label": "q4", "widget": "radio", "required": True,
+         "column": "Considered Dropping Out", "options": ["yes", "no"]},
+        {"key": "q4_desc", "label": "q4_desc", "widget": "text_area",
+         "column": "Considered Dropping Out - Description", "show_if": ("q4", ["yes"])},
+        {"key": "q5", "label": "q5", "widget": "radio", "required": True,
+         "column": "Study Influence on Perspective",
+         "options": ["very_positive", "positive", "no_impact", "negative", "very_negative"]},
+        {"key": "q6", "label": "q6", "widget": "radio", "required": True,
+         "column": "Recommendation Likelihood",
+         "options": ["definitely", "probably", "not_sure", "probably_not", "definitely_not"]},
+        {"key": "q7", "label": "q7", "widget": "multiselect", "required": True,
+         "column": "Future Participation Encouragement",
+         "options": ["communication", "flexible_scheduling", "clear_expectations", "support_services",
+                     "financial_incentives", "other"]},
+        {"key": "q7_other", "label": "q7_other", "widget": "text_input",
+         "column": "Future Participation Encouragement - Other", "show_if": ("q7", ["other"])},
+        {"key": "q8_desc", "label": "q8", "widget": "text_area", "column": "Suggested Improvements"},
+        {"key": "q9_desc", "label": "q9", "widget": "text_area", "column": "Memorable Moments"},
+    ],
+    "suffix": [
+        ("Submission ID", "submission_id"),
+    ],
+}
+
+FORMS = {form["name"]: form for form in (ON_TRIAL, POST_TRIAL)}
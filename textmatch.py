@@ -0,0 +1,53 @@
+import re
+import unicodedata
+
+# -------------------------------
+# Text normalization and lexicon matching
+# -------------------------------
+# The part of free-text screening (screening.py) that runs in the worker
+# processes. It imports only the standard library, so a spawned worker
+# does not load Streamlit or the app's modules.
+
+TOKEN = re.compile(r"\w+")
+# Applied after casefold, which already turns ß into ss
+UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue"})
+
+
+def tokenize(text):
+    spelled = unicodedata.normalize("NFC", text.casefold()).translate(UMLAUTS)
+    folded = unicodedata.normalize("NFKD", spelled)
+    return TOKEN.findall("".join(c for c in folded if not unicodedata.combining(c)))
+
+
+def compile_lexicon(raw):
+    # {category: [entry]} -> [(category, entry, tokens, prefix)]
+    compiled = []
+    for category, entries in raw.items():
+        for entry in entries:
+            tokens = tokenize(entry)
+            if tokens:
+                compiled.append((category, entry, tuple(tokens), entry.rstrip().endswith("*")))
+    return compiled
+
+
+def _matches(tokens, lexicon):
+    hits = set()
+    for category, entry, terms, prefix in lexicon:
+        n = len(terms)
+        for start in range(len(tokens) - n + 1):
+            window = tokens[start:start + n]
+            if window[:-1] == list(terms[:-1]) and (
+                window[-1].startswith(terms[-1]) if prefix else window[-1] == terms[-1]
+            ):
+                hits.add((category, entry))
+                break
+    return sorted(hits)
+
+
+def screen_batch(lexicon, texts):
+    # Runs in a pool process: [text] -> [(tokens, [(category, entry)])]
+    results = []
+    for text in texts:
+        tokens = tokenize(text)
+        results.append((tokens, _matches(tokens, lexicon)))
+    return results
@@ -0,0 +1,179 @@
+import bisect
+import os
+import sys
+import threading
+
+import streamlit as st
+
+import localdb
+import mirror
+import shards
+import survey_schema
+
+# -------------------------------
+# Per-client trajectories
+# -------------------------------
+# The On-Trial form is filled in at every visit, so each client has a
+# series of answers. encode() turns mirrored sheet rows into one severity
+# score per ordered question (0 = best, see "worse" in surveys.py),
+# sorted by (client, timestamp). compute() adds, per client and question,
+# the change since the previous visit, the mean of the last WINDOW visits
+# and two flags: "declining" after DECLINE_VISITS consecutive worsenings
+# and "persistent" after PERSIST_VISITS consecutive visits at the worst
+# level (e.g. new symptoms reported again and again). All of it is
+# vectorized over every client at once. ClientIndex finds a client's rows
+# by bisecting the sorted keys instead of scanning. The dashboard's index
+# covers the worksheet shards (shards.py) of the last MONTHS months only.
+#
+#   python trends.py              clients with a flag at their latest visit
+#   python trends.py <client>     one client's history
+
+WINDOW = int(os.environ.get("FEEDBACK_TREND_WINDOW", "3"))
+DECLINE_VISITS = int(os.environ.get("FEEDBACK_TREND_DECLINE_VISITS", "2"))
+PERSIST_VISITS = int(os.environ.get("FEEDBACK_TREND_PERSIST_VISITS", "3"))
+# Months of shards the dashboard's index reads; 0 reads all of them
+MONTHS = int(os.environ.get("FEEDBACK_TREND_MONTHS", "6"))
+SEPARATOR = "\x1f"
+FLAGS = ("declining", "persistent")
+
+
+def encode(form, frame):
+    # frame: sheet rows named like form.headers -> client, timestamp, scores
+    import pandas as pd
+
+    language = frame[form.column_of("language")]
+    out = pd.DataFrame({
+        "client": frame[form.column_of("client")].astype(str),
+        "timestamp": pd.to_datetime(frame[form.column_of("timestamp")], errors="coerce"),
+    })
+    for field in form.ordinal_fields:
+        scale = {
+            f"{lang}{SEPARATOR}{label}": field.severity(i)
+            for lang, index in form.label_index.items()
+            for label, i in index[field.key].items()
+        }
+        out[field.key] = (language + SEPARATOR + frame[field.column]).map(scale).astype("float64")
+    out = out.dropna(subset=["timestamp"])
+    return out.sort_values(["client", "timestamp"], kind="stable").reset_index(drop=True)
+
+
+def _streak(flag, client):
+    # Length of the current run of True within each client, 0 where False
+    run = ((flag != flag.shift()) | (client != client.shift())).cumsum()
+    return flag.astype(int).groupby(run).cumsum()
+
+
+def compute(form, encoded, window=WINDOW):
+    # encoded: output of encode(); returns it with visit number and trend columns
+    import numpy as np
+
+    client = encoded["client"]
+    out = encoded.assign(visit=encoded.groupby("client", sort=False).cumcount() + 1)
+    columns = {}
+    for field in form.ordinal_fields:
+        score = encoded[field.key]
+        delta = score.groupby(client, sort=False).diff()
+        # Rolling mean of the answered visits from per-client running sums
+        total = score.fillna(0).groupby(client, sort=False).cumsum()
+        count = score.notna().astype(int).groupby(client, sort=False).cumsum()
+        answered = count - count.groupby(client, sort=False).shift(window, fill_value=0)
+        summed = total - total.groupby(client, sort=False).shift(window, fill_value=0)
+        columns[f"{field.key}__delta"] = delta
+        columns[f"{field.key}__mean"] = summed / answered.replace(0, np.nan)
+        columns[f"{field.key}__declining"] = _streak(delta > 0, client) >= DECLINE_VISITS
+        columns[f"{field.key}__persistent"] = _streak(score == len(field.codes) - 1, client) >= PERSIST_VISITS
+    return out.assign(**columns)
+
+
+class ClientIndex:
+    def __init__(self, form, table):
+        # table: compute() output, sorted by (client, timestamp)
+        self.form = form
+        self.table = table
+        self._clients = table["client"].tolist()
+        self._times = table["timestamp"].tolist()
+
+    def _span(self, client):
+        lo = bisect.bisect_left(self._clients, client)
+        return lo, bisect.bisect_right(self._clients, client, lo)
+
+    def clients(self):
+        return self.table["client"].drop_duplicates().tolist()
+
+    def history(self, client, since=None, until=None):
+        lo, hi = self._span(client)
+        if since is not None:
+            lo = bisect.bisect_left(self._times, since, lo, hi)
+        if until is not None:
+            hi = bisect.bisect_right(self._times, until, lo, hi)
+        return self.table.iloc[lo:hi]
+
+    def latest(self, client):
+        lo, hi = self._span(client)
+        return self.table.iloc[hi - 1] if hi > lo else None
+
+    def flags(self, client):
+        # (question, flag) raised at the client's latest visit
+        row = self.latest(client)
+        if row is None:
+            return []
+        return [
+            (field.key, flag) for field in self.form.ordinal_fields for flag in FLAGS
+            if row[f"{field.key}__{flag}"]
+        ]
+
+    def flagged(self):
+        # Latest visit of every client with at least one flag raised
+        latest = self.table.groupby("client", sort=False).tail(1)
+        columns = [f"{field.key}__{flag}" for field in self.form.ordinal_fields for flag in FLAGS]
+        return latest[latest[columns].any(axis=1)]
+
+
+def build(form, local, worksheets=None):
+    # worksheets: the form's shard tabs, oldest first (default: its base worksheet)
+    frame = local.frame(worksheets or [form.worksheet], form.headers)
+    return ClientIndex(form, compute(form, encode(form, frame)))
+
+
+class Trends:
+    # Rebuilds the index when the mirror has synced one of the form's tabs
+    # since the last build, or a new month brings in or drops a tab
+    def __init__(self, form, local, directory, months=MONTHS):
+        self.form = form
+        self.local = local
+        self.directory = directory
+        self.months = months
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._index = None
+
+    def worksheets(self):
+        if not self.months:
+            return self.directory.worksheets(self.form.worksheet)
+        return self.directory.current(self.form.worksheet, self.months)
+
+    def index(self):
+        worksheets = self.worksheets()
+        synced_at = [(name, self.local.synced_at(name)) for name in worksheets]
+        with self._lock:
+            if self._index is None or synced_at != self._synced_at:
+                self._index = build(self.form, self.local, worksheets)
+                self._synced_at = synced_at
+            return self._index
+
+
+@st.cache_resource(show_spinner=False)
+def get_trends(form_name="on_trial"):
+    return Trends(survey_schema.compile_form(form_name), mirror.get_mirror(), shards.get_directory())
+
+
+if __name__ == "__main__":
+    form = survey_schema.compile_form("on_trial")
+    # One client's history only needs that client's tabs (month,client shards)
+    worksheets = shards.open_directory().worksheets(form.worksheet, client=(sys.argv[1:] or [None])[0])
+    index = build(form, mirror.Mirror(localdb.connect(mirror.MIRROR_FILE)), worksheets)
+    if sys.argv[1:]:
+        print(index.history(sys.argv[1]).to_string(index=False))
+    else:
+        for client in index.flagged()["client"]:
+            print(client, ", ".join(f"{key} {flag}" for key, flag in index.flags(client)))